@@ -0,0 +1,183 @@
+"""ritim_core için performans ölçüm takımı.
+
+Sentetik okullar (varsayılan 40 / 1.000 / 10.000 öğrenci; her öğrenciye yetecek kadar eğitmen/oda ve her
+birinde tamamen dolu haftalık tablo, yıllara yayılan aylık ödeme geçmişi, geçmiş haftalarda durum kayıtları) üretir ve her işlem için süreyi ve en yüksek
+bellek kullanımını raporlar:
+
+    python benchmark.py
+    python benchmark.py --sizes 40 1000 --repeat 10 --output bench.json
+"""
+import argparse
+import gc
+import io
+import json
+import math
+import os
+import random
+import tempfile
+import time as timer
+import tracemalloc
+from datetime import date, time, timedelta
+from typing import Any, Callable, Dict, List
+
+from ritim_core import (
+    DAYS, TIME_SLOTS, SCHEMA_VERSION, DEFAULT_RESOURCE, JsonJournalStorage, SqliteStorage, SharedStore, apply_op, aging_report, calculate_statistics,
+    check_conflict, compute_payment_status, compute_week, free_slots, next_due_date, render_table_html, shift_week,
+    student_fault_summary, week_key, to_minutes, from_minutes, iter_export, plan_import,
+)
+
+STATUSES = ["Yapıldı", "Yapıldı", "Yapıldı", "Yapılmadı-Öğrenci", "Yapılmadı-Eğitmen", "İptal"]
+
+def build_school(n_students: int, years: int = 3, history_weeks: int = 12, seed: int = 0) -> Dict[str, Any]:
+    """Serileştirilmiş (ritim_data.json biçiminde) sentetik okul verisi."""
+    rng = random.Random(seed)
+    today = date.today()
+    students = []
+    for sid in range(1, n_students + 1):
+        payment_day = rng.randint(1, 28)
+        history = []
+        month = date(today.year - years, today.month, 1)
+        while month <= today:
+            if rng.random() < 0.9: history.append(month.replace(day=payment_day))
+            month = (month + timedelta(days=32)).replace(day=1)
+        history = sorted((d for d in history if d <= today), reverse=True)
+        last = history[0] if history else None
+        students.append({"id": sid, "name": f"Öğrenci {sid}", "parent_name": f"Veli {sid}", "parent_phone": f"0555{sid:07d}",
+                         "dob": date(2010 + sid % 10, 1 + sid % 12, 1 + sid % 28).isoformat(), "payment_day": payment_day,
+                         "next_payment_due_date": next_due_date(last, payment_day).isoformat() if last else None,
+                         "last_payment_date": last.isoformat() if last else None,
+                         "payment_history": [d.isoformat() for d in history]})
+    # Her kaynakta mesai saatleri içindeki her yarım saatlik dilim dolu; öğrenciler sırayla dağıtılır
+    # (kaynak sayısı, öğrencilerin aynı saatte iki derse düşmeyeceği kadar).
+    slots_per_resource = len(DAYS) * (len(TIME_SLOTS) - 1)
+    resources = [{"id": DEFAULT_RESOURCE, "name": "Genel", "working_hours": None}]
+    resources += [{"id": f"k{i}", "name": f"Oda {i}", "working_hours": None} for i in range(2, math.ceil(n_students / slots_per_resource) + 1)]
+    schedule = {day: [] for day in DAYS}
+    slot_index = 0
+    for resource in resources:
+        for day in DAYS:
+            for slot in TIME_SLOTS:
+                if slot >= time(22, 0): continue
+                end = from_minutes(to_minutes(slot) + 30)
+                lesson = {"student_id": slot_index % n_students + 1, "start": slot.strftime('%H:%M:%S'), "end": end.strftime('%H:%M:%S')}
+                if resource["id"] != DEFAULT_RESOURCE: lesson["resource"] = resource["id"]
+                schedule[day].append(lesson)
+                slot_index += 1
+    data = {"students": students, "schedule": schedule, "working_hours": ["08:00:00", "22:00:00"], "resources": resources,
+            "journal_seq": 0, "schema_version": SCHEMA_VERSION}
+    weeks = {}
+    current = week_key(today)
+    for offset in range(1, history_weeks + 1):
+        key = shift_week(current, -offset)
+        weeks[key] = [{"op": "set_status", "week": key, "day": day, "start": lesson["start"], "status": rng.choice(STATUSES), **({"resource": lesson["resource"]} if "resource" in lesson else {})}
+                      for day in DAYS for lesson in schedule[day]]
+    return {"data": data, "week_ops": weeks}
+
+def measure(fn: Callable[[], Any], repeat: int, setup: Callable[[], Any] = None) -> Dict[str, float]:
+    """En iyi süre (ms) ve tek çalıştırmadaki en yüksek ek bellek (KiB)."""
+    best = float("inf")
+    for _ in range(repeat):
+        if setup: setup()
+        gc.collect()
+        started = timer.perf_counter()
+        fn()
+        best = min(best, timer.perf_counter() - started)
+    if setup: setup()
+    gc.collect()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return {"ms": best * 1000, "peak_kib": peak / 1024}
+
+def clear_caches(app: Dict[str, Any]):
+    for key in [k for k in app if k.startswith("_") and k.endswith(("_cache", "_lru", "intervals", "_pos"))]:
+        del app[key]
+
+def run_size(n_students: int, repeat: int, workdir: str) -> List[Dict[str, Any]]:
+    school = build_school(n_students)
+    base = os.path.join(workdir, f"school_{n_students}")
+    os.makedirs(base, exist_ok=True)
+    data_file, journal_file, weeks_dir, snapshot_file = (os.path.join(base, name) for name in ("ritim_data.json", "ritim_data.journal", "ritim_weeks", "ritim_data.cache"))
+    with open(data_file, 'w', encoding='utf-8') as f:
+        json.dump(school["data"], f, ensure_ascii=False)
+    json_storage = JsonJournalStorage(data_file, journal_file, weeks_dir, snapshot_file)
+    app = json_storage.load()
+    for ops in school["week_ops"].values():
+        for op in ops: apply_op(app, op)
+    json_storage.save(app)
+
+    store = SharedStore(json_storage)
+    app = store.app
+    current = week_key(date.today())
+    past = shift_week(current, -1)
+    sqlite_storage = SqliteStorage(os.path.join(base, "ritim_data.db"))
+    lessons = [(day, lesson["start"], lesson.get("resource")) for day in DAYS for lesson in app["schedule"][day]]
+    shown = [r["id"] for r in app["resources"][:4]]
+    render_cache: Dict[str, Any] = {}
+    counter = iter(range(10 ** 9))
+
+    def set_status():
+        day, start, resource = lessons[next(counter) % len(lessons)]
+        op = {"op": "set_status", "week": current, "day": day, "start": start.strftime('%H:%M:%S'), "status": "Yapıldı"}
+        store.commit({**op, "resource": resource} if resource else op, store.version)
+
+    def add_payment():
+        i = next(counter)
+        store.commit({"op": "add_payment", "id": i % n_students + 1, "date": (date.today() - timedelta(days=i % 3000)).isoformat()}, store.version)
+
+    def conflict_scan():
+        for day in DAYS:
+            for slot in TIME_SLOTS[:-1]: check_conflict(app, day, slot, from_minutes(to_minutes(slot) + 30))
+
+    results = []
+    operations = [
+        ("json.load (önbellekli)", lambda: JsonJournalStorage(data_file, journal_file, weeks_dir, snapshot_file).load(), None),
+        ("json.load (önbelleksiz)", lambda: JsonJournalStorage(data_file, journal_file, weeks_dir, snapshot_file).load(), lambda: os.path.exists(snapshot_file) and os.remove(snapshot_file)),
+        ("json.save", lambda: json_storage.save(app), None),
+        ("sqlite.save", lambda: sqlite_storage.save(app), None),
+        ("sqlite.load", sqlite_storage.load, None),
+        ("commit.set_status", set_status, None),
+        ("commit.add_payment", add_payment, None),
+        ("check_conflict (tüm dilimler)", conflict_scan, None),
+        ("free_slots", lambda: free_slots(app, 60), lambda: clear_caches(app)),
+        ("calculate_statistics", lambda: calculate_statistics(app), None),
+        ("compute_week (geçmiş hafta)", lambda: compute_week(app, past), None),
+        ("compute_week (tek kaynak)", lambda: compute_week(app, past, shown[-1]), None),
+        ("render_table_html (soğuk)", lambda: render_table_html(app, past, cache=render_cache), lambda: (clear_caches(app), render_cache.clear())),
+        ("render_table_html (sıcak)", lambda: render_table_html(app, past, cache=render_cache), None),
+        (f"render_table_html (yan yana {len(shown)})", lambda: [render_table_html(app, past, r, render_cache) for r in shown], lambda: (clear_caches(app), render_cache.clear())),
+        ("compute_payment_status", lambda: compute_payment_status(app, date.today()), None),
+        ("aging_report (soğuk)", lambda: aging_report(app), lambda: clear_caches(app)),
+        ("student_fault_summary", lambda: student_fault_summary(app), None),
+        ("iter_export (ödemeler)", lambda: sum(1 for _ in iter_export(app, "payments")), None),
+        ("plan_import (öğrenciler)", lambda: plan_import(app, "students", io.StringIO("".join(iter_export(app, "students")))), None),
+    ]
+    for name, fn, setup in operations:
+        results.append({"students": n_students, "operation": name, **measure(fn, repeat, setup)})
+    sqlite_storage.conn.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[40, 1000, 10000], help="Öğrenci sayıları")
+    parser.add_argument("--repeat", type=int, default=5, help="Her işlem için tekrar sayısı (en iyisi raporlanır)")
+    parser.add_argument("--output", help="Sonuçların yazılacağı JSON dosyası")
+    args = parser.parse_args()
+    results = []
+    with tempfile.TemporaryDirectory(prefix="ritim_bench_") as workdir:
+        for n_students in args.sizes:
+            rows = run_size(n_students, args.repeat, workdir)
+            results.extend(rows)
+            print(f"\n{n_students} öğrenci")
+            print(f"{'İşlem':<34}{'Süre (ms)':>12}{'Bellek (KiB)':>15}")
+            for row in rows:
+                print(f"{row['operation']:<34}{row['ms']:>12.2f}{row['peak_kib']:>15.1f}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,147 +1,152 @@
 import streamlit as st
 from datetime import datetime, time, timedelta, date
-from typing import List, Dict, Any
+from typing import Dict, Any
+from collections import deque
+import functools
+import io
 import json
+import logging
+from logging.handlers import RotatingFileHandler
 import os
-from dateutil.relativedelta import relativedelta
+from ritim_core import (
+    DAYS, TIME_SLOTS, AGING_BUCKETS, BRANCHES, DEFAULT_RESOURCE, RerunProfile, SharedStore, add_io, get_storage, week_key, week_monday, shift_week, hhmm, to_dt,
+    to_minutes, from_minutes, student_position, payment_history, lesson_student_name, week_lesson, free_slots, payment_status, aging_report,
+    calculate_statistics, render_table_html, student_fault_summary, schedule_version_key, memoized, plan_import, iter_export,
+    resource_hours, resource_name, next_resource_id, find_resource,
+)
 
 st.set_page_config(page_title="Haftalık Ders Planı", layout="wide")
 
 # ---------- Sabitler ----------
-DAYS = ["Pazartesi", "Salı", "Çarşamba", "Perşembe", "Cuma", "Cumartesi"]
-TIME_SLOTS: List[time] = [time(h, m) for h in range(8, 22) for m in (0, 30)]
-if time(22, 0) not in TIME_SLOTS:
-    TIME_SLOTS.append(time(22, 0))
-DATA_FILE = "ritim_data.json"
 LOGO_FILE = "drumschool.jpeg"
+DURATION_MAP = {"30 dk": 30, "1 saat": 60, "2 saat": 120}
+CSV_KINDS = {"students": "Öğrenciler", "schedule": "Haftalık Program", "payments": "Ödemeler"}
+PROFILE_LOG_FILE = "ritim_profile.log"
+PROFILE_LOG_MAX_BYTES = 1024 * 1024  # Dolunca ritim_profile.log.1 ... .3 olarak döner
+PROFILE_HISTORY = 20  # Hata ayıklama panelinde gösterilen son çalıştırma sayısı
+DEBUG = os.environ.get("RITIM_DEBUG") == "1"  # Performans panelini gösterir
 
-# ---------- State (JSON Dosyası ile Veri Yönetimi) ----------
-def save_state():
-    data_to_save = st.session_state.app.copy()
-    schedule_str = {day: [] for day in DAYS}
-    for day, lessons in data_to_save.get("schedule", {}).items():
-        for lesson in lessons:
-            lesson_copy = lesson.copy()
-            lesson_copy["start"] = lesson["start"].strftime('%H:%M:%S')
-            lesson_copy["end"] = lesson["end"].strftime('%H:%M:%S')
-            schedule_str[day].append(lesson_copy)
-    data_to_save["schedule"] = schedule_str
-    students_str = []
-    for student in data_to_save.get("students", []):
-        student_copy = student.copy()
-        for key in ["dob", "next_payment_due_date", "last_payment_date"]:
-             if student_copy.get(key) and isinstance(student_copy[key], date):
-                student_copy[key] = student_copy[key].isoformat()
-        if "payment_history" in student_copy:
-            student_copy["payment_history"] = [d.isoformat() for d in student_copy["payment_history"]]
-        students_str.append(student_copy)
-    data_to_save["students"] = students_str
-    data_to_save["working_hours"] = [t.strftime('%H:%M:%S') for t in data_to_save["working_hours"]]
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data_to_save, f, ensure_ascii=False, indent=4)
+# ---------- State ----------
+# Her şubenin verisi ayrı dosyalardadır (RITIM_BRANCHES); bir şubenin deposu ancak o şube ilk kez
+# seçildiğinde yüklenir ve süreç boyunca oturumlar arasında paylaşılır.
+@st.cache_resource
+def get_store(branch: str) -> SharedStore:
+    return SharedStore(get_storage(branch))
 
-def load_state():
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            if data.get("students"):
-                migrated_students = []
-                for i, student_data in enumerate(data["students"]):
-                    if isinstance(student_data, str): 
-                        migrated_students.append({"id": i + 1, "name": student_data, "parent_name": "", "parent_phone": "", "dob": None, "payment_day": 1, "next_payment_due_date": None, "last_payment_date": None, "payment_history": []})
-                    else:
-                        student_data.pop("credits", None)
-                        if "payment_day" not in student_data: student_data["payment_day"] = 1
-                        if "next_payment_due_date" not in student_data: student_data["next_payment_due_date"] = None
-                        if "last_payment_date" not in student_data: student_data["last_payment_date"] = None
-                        if "payment_history" not in student_data: student_data["payment_history"] = []
-                        migrated_students.append(student_data)
-                data["students"] = migrated_students
-            
-            for day, lessons in data.get("schedule", {}).items():
-                for lesson in lessons:
-                    lesson["start"] = datetime.strptime(lesson["start"], '%H:%M:%S').time()
-                    lesson["end"] = datetime.strptime(lesson["end"], '%H:%M:%S').time()
-            
-            for student in data.get("students", []):
-                for key in ["dob", "next_payment_due_date", "last_payment_date"]:
-                    if student.get(key):
-                        try: student[key] = datetime.fromisoformat(student[key]).date()
-                        except (ValueError, TypeError): student[key] = None
-                if "payment_history" in student:
-                    student["payment_history"] = sorted([datetime.fromisoformat(d).date() for d in student["payment_history"]], reverse=True)
+def current_branch() -> str:
+    return st.session_state.get("branch", BRANCHES[0])
 
-            data["working_hours"] = tuple(datetime.strptime(t, '%H:%M:%S').time() for t in data["working_hours"])
-            return data
-            
-    return {"students": [{"id": i, "name": f"Öğrenci {i}", "parent_name": "", "parent_phone": "", "dob": None, "payment_day": 1, "next_payment_due_date": None, "last_payment_date": None, "payment_history": []} for i in range(1, 41)],"schedule": {day: [] for day in DAYS},"working_hours": (time(8, 0), time(22, 0))}
+def current_store() -> SharedStore:
+    return get_store(current_branch())
+
+def view_cache() -> Dict[str, Any]:
+    """Oturumun (şube başına) görünüm önbellekleri; ortak app sözlüğünde tutulmaz."""
+    return st.session_state.setdefault("view_caches", {}).setdefault(current_branch(), {})
+
+def commit(op: Dict[str, Any]) -> bool:
+    """İşlemi ortak duruma uygular; geçersizse veya çakışıyorsa hatayı gösterip False döndürür."""
+    try:
+        with phase("save"):
+            version, written = current_store().commit(op, st.session_state.base_version)
+    except ValueError as e:
+        st.error(str(e)); return False
+    add_io(current_profile().io, written)
+    if version == st.session_state.base_version + 1:  # Arada başka oturum yazmadıysa görünüm güncel
+        st.session_state.base_version = version
+    return True
+
+def commit_batch(ops, allow_duplicate_names: bool = False) -> bool:
+    """Toplu işlemleri tek sürüm ve tek kayıtla uygular; hata olursa hiçbirini uygulamaz."""
+    try:
+        with phase("save"):
+            version, written = current_store().commit_batch(ops, st.session_state.base_version, allow_duplicate_names)
+    except ValueError as e:
+        st.error(str(e)); return False
+    add_io(current_profile().io, written)
+    if version == st.session_state.base_version + 1:
+        st.session_state.base_version = version
+    return True
+
+# ---------- Profil ----------
+# Her çalıştırma bir RerunProfile açar; aşamalar phase() ile ölçülür, sayfa sonunda kayıt son
+# PROFILE_HISTORY çalıştırmanın listesine ve dönen ritim_profile.log dosyasına (satır başına JSON) eklenir.
+# Tek başına yeniden çalışan bir fragment kendi kaydını açıp kapatır. st.rerun() ile kesilen çalıştırma,
+# ardından gelenle tek kayıt olur. Yazma sayaçları yalnızca bu çalıştırmanın commit'lerinden gelir.
+@st.cache_resource
+def get_profile_logger() -> logging.Logger:
+    logger = logging.getLogger("ritim.profile")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    handler = RotatingFileHandler(PROFILE_LOG_FILE, maxBytes=PROFILE_LOG_MAX_BYTES, backupCount=3, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    return logger
+
+def current_profile() -> RerunProfile:
+    profile = st.session_state.get("rerun_profile")
+    if profile is None or profile.finished:
+        profile = st.session_state.rerun_profile = RerunProfile()
+    return profile
+
+def phase(name: str):
+    return current_profile().phase(name)
+
+def finish_profile():
+    record = current_profile().finish()
+    if "profile_history" not in st.session_state:
+        st.session_state.profile_history = deque(maxlen=PROFILE_HISTORY)
+    st.session_state.profile_history.append(record)
+    get_profile_logger().info(json.dumps(record, ensure_ascii=False))
+
+def profiled_fragment(name: str):
+    """st.fragment; sayfa çalışırken süresi "name" aşamasına yazılır, tek başına çalışınca kendi kaydını tutar."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def run():
+            profile = current_profile()
+            standalone = profile.kind is None
+            if standalone: profile.kind = name
+            with profile.phase(name):
+                fn()
+            if standalone: finish_profile()
+        return st.fragment(run)
+    return decorator
 
 def init_state():
-    if "app" not in st.session_state:
-        st.session_state.app = load_state()
+    store = current_store()
+    st.session_state.app = store.app  # Kopya değil, paylaşılan durumun kendisi
+    st.session_state.base_version = store.version
     if "selected_lesson" not in st.session_state:
         st.session_state.selected_lesson = None
-init_state()
+    if "selected_week" not in st.session_state:
+        st.session_state.selected_week = week_key(date.today())
+# Tablodaki ders bağlantısı yeni bir oturum açar; şube adresten okunur, yoksa ilk şubenin deposu açılırdı
+if st.query_params.get("branch") in BRANCHES:
+    st.session_state.branch = st.query_params["branch"]
+current_profile().kind = current_profile().kind or "sayfa"
+with phase("load"):
+    init_state()
 
-# (Kalan tüm kodlar, yardımcı fonksiyonlar, sidebar, tablo render vb. öncekiyle aynıdır ve buraya tam haliyle eklenmiştir.)
-# ---------- Helpers ----------
-def to_dt(t: time) -> datetime: return datetime.combine(date.today(), t)
-def hhmm(t: time) -> str: return t.strftime("%H:%M")
-def check_conflict(day: str, start_t: time, end_t: time) -> bool:
-    for ev in st.session_state.app["schedule"].get(day, []):
-        if to_dt(start_t) < to_dt(ev["end"]) and to_dt(end_t) > to_dt(ev["start"]):
-            return True
-    return False
-def add_lesson(day: str, start_t: time, dur_minutes: int, student_name: str) -> bool:
-    end_t = (to_dt(start_t) + timedelta(minutes=dur_minutes)).time()
-    wh_start, wh_end = st.session_state.app["working_hours"]
-    if to_dt(start_t) < to_dt(wh_start) or to_dt(end_t) > to_dt(wh_end):
-        st.error("Ders mesai saatleri dışında."); return False
-    if check_conflict(day, start_t, end_t):
-        st.error("Bu zaman aralığında çakışma var."); return False
-    st.session_state.app["schedule"][day].append({"student": student_name, "start": start_t, "end": end_t, "status": "Planlandı"})
-    st.session_state.app["schedule"][day].sort(key=lambda e: e["start"])
-    save_state()
-    return True
-def duration_to_slots(start_t: time, end_t: time) -> int:
-    mins = int((to_dt(end_t) - to_dt(start_t)).total_seconds() // 60)
-    return max(1, mins // 30)
-def calculate_statistics():
-    wh_start, wh_end = st.session_state.app["working_hours"]
-    daily_available_minutes = (to_dt(wh_end) - to_dt(wh_start)).total_seconds() / 60
-    total_available_minutes = daily_available_minutes * len(DAYS)
-    total_filled_minutes = 0
-    for day in DAYS:
-        for lesson in st.session_state.app["schedule"].get(day, []):
-            lesson_duration = (to_dt(lesson["end"]) - to_dt(lesson["start"])).total_seconds() / 60
-            total_filled_minutes += lesson_duration
-    total_empty_minutes = total_available_minutes - total_filled_minutes
-    occupancy_rate = (total_filled_minutes / total_available_minutes) * 100 if total_available_minutes > 0 else 0
-    return {"filled_hours": total_filled_minutes / 60, "empty_hours": total_empty_minutes / 60, "occupancy_rate": occupancy_rate}
+def with_resource(op: Dict[str, Any], resource: str) -> Dict[str, Any]:
+    """Varsayılan kaynak işlemlere yazılmaz; günlükte yalnızca diğer kaynaklar "resource" alanı taşır."""
+    return op if resource == DEFAULT_RESOURCE else {**op, "resource": resource}
 
+def add_lesson(day: str, start_t: time, dur_minutes: int, student_id: int, makeup_week: str = None, resource: str = DEFAULT_RESOURCE) -> bool:
+    """Her hafta tekrar eden ders ekler; makeup_week verilirse yalnızca o haftaya telafi dersi ekler."""
+    end_t = (to_dt(start_t) + timedelta(minutes=dur_minutes)).time()
+    op = with_resource({"day": day, "start": start_t.strftime('%H:%M:%S'), "end": end_t.strftime('%H:%M:%S'), "student_id": student_id}, resource)
+    if makeup_week:
+        return commit({"op": "add_makeup", "week": makeup_week, **op})
+    return commit({"op": "add_lesson", "since": st.session_state.selected_week, **op})
 # ---------- Callback Fonksiyonları ----------
-def update_status_and_close(day, index, new_status):
-    st.session_state.app["schedule"][day][index]["status"] = new_status
-    save_state()
+def update_status_and_close(week, day, start_t, new_status, resource=DEFAULT_RESOURCE):
+    commit(with_resource({"op": "set_status", "week": week, "day": day, "start": start_t.strftime('%H:%M:%S'), "status": new_status}, resource))
     st.session_state.selected_lesson = None
+def shift_selected_week(weeks: int):
+    st.session_state.selected_week = shift_week(st.session_state.selected_week, weeks) if weeks else week_key(date.today())
 def delete_payment(student_index, payment_to_delete):
     student = st.session_state.app["students"][student_index]
-    history = student["payment_history"]
-    if payment_to_delete in history:
-        history.remove(payment_to_delete)
-        history.sort(reverse=True)
-        if history:
-            new_last_payment = history[0]
-            student["last_payment_date"] = new_last_payment
-            payment_day = student.get("payment_day", 1)
-            next_due_date = new_last_payment + relativedelta(months=1)
-            try: next_due_date = next_due_date.replace(day=payment_day)
-            except ValueError: next_due_date = (next_due_date + relativedelta(months=1)).replace(day=1) - timedelta(days=1)
-            student["next_payment_due_date"] = next_due_date
-        else:
-            student["last_payment_date"] = None
-            student["next_payment_due_date"] = None
-        save_state()
+    if commit({"op": "delete_payment", "id": student["id"], "date": payment_to_delete.isoformat()}):
         st.success(f"{payment_to_delete.strftime('%d %b')} tarihli ödeme silindi.")
 
 # ---------- Başlık ve Arayüz Ayarları ----------
@@ -149,31 +154,60 @@ st.markdown("""<style>.block-container {padding-top: 2rem;}</style>""", unsafe_a
 st.markdown("## 🥁 Haftalık Ders Planı (Drum School)")
 
 # ---------- Sidebar ----------
-with st.sidebar:
+# Her panel ayrı bir fragment olarak çalışır: bir paneldeki seçim yalnızca o paneli yeniden çalıştırır.
+# Veriyi değiştiren işlemler sonrasında st.rerun() tüm sayfayı yeniler.
+def resource_select(label: str, key: str) -> str:
+    resources = [r["id"] for r in st.session_state.app["resources"]]
+    return st.selectbox(label, resources, format_func=lambda r: resource_name(st.session_state.app, r), key=key)
+@profiled_fragment("sidebar.add_lesson")
+def add_lesson_panel():
     with st.expander("➕ Ders Ekle", expanded=True):
+        resource = resource_select("Eğitmen / Oda", key="add_resource")
         day = st.selectbox("Gün", DAYS)
         start_str = st.selectbox("Başlangıç", [t.strftime('%H:%M') for t in TIME_SLOTS])
-        duration_map = {"30 dk": 30, "1 saat": 60, "2 saat": 120}
-        duration_str = st.selectbox("Süre", list(duration_map.keys()), index=1)
-        dur_minutes = duration_map[duration_str]
+        duration_str = st.selectbox("Süre", list(DURATION_MAP.keys()), index=1)
+        dur_minutes = DURATION_MAP[duration_str]
         start_t = datetime.strptime(start_str, '%H:%M').time()
         students = st.session_state.app["students"]
         student_to_add = st.selectbox("Öğrenci Seç", students, format_func=lambda s: s['name'])
+        only_this_week = st.checkbox(f"Sadece {st.session_state.selected_week} haftasına telafi dersi olarak ekle")
         if st.button("Dersi Ekle", use_container_width=True):
-            if student_to_add and add_lesson(day, start_t, dur_minutes, student_to_add['name']):
+            if student_to_add and add_lesson(day, start_t, dur_minutes, student_to_add['id'], st.session_state.selected_week if only_this_week else None, resource):
                 st.success(f"Eklendi: {day} {start_str} - {student_to_add['name']}")
                 st.rerun()
+@profiled_fragment("sidebar.suggest")
+def suggest_slots_panel():
+    with st.expander("🔎 Uygun Saat Öner"):
+        suggest_duration_str = st.selectbox("Süre", list(DURATION_MAP.keys()), index=1, key="suggest_duration")
+        suggest_minutes = DURATION_MAP[suggest_duration_str]
+        resource = resource_select("Eğitmen / Oda", key="suggest_resource")
+        candidates = []
+        for free_day, free_start, free_end in free_slots(st.session_state.app, suggest_minutes, resource, st.session_state.selected_week):
+            for slot_m in range(to_minutes(free_start), to_minutes(free_end) - suggest_minutes + 1, 30):
+                candidates.append((free_day, from_minutes(slot_m)))
+        if not candidates:
+            st.info("Bu süre için boş saat bulunmuyor.")
+        else:
+            st.caption(f"{len(candidates)} uygun başlangıç saati bulundu.")
+            suggested = st.selectbox("Uygun Saatler", candidates, format_func=lambda c: f"{c[0]} {hhmm(c[1])}", key="suggest_slot")
+            suggest_student = st.selectbox("Öğrenci Seç", st.session_state.app["students"], format_func=lambda s: s['name'], key="suggest_student")
+            if st.button("Bu Saate Ekle", use_container_width=True):
+                if suggest_student and add_lesson(suggested[0], suggested[1], suggest_minutes, suggest_student['id'], resource=resource):
+                    st.success(f"Eklendi: {suggested[0]} {hhmm(suggested[1])} - {suggest_student['name']}")
+                    st.rerun()
+@profiled_fragment("sidebar.students")
+def student_management_panel():
     with st.expander("👥 Öğrenci Yönetimi"):
         st.write("Öğrenci Bilgilerini Düzenle")
         all_students = st.session_state.app["students"]
         selected_student_manage = st.selectbox("Düzenlenecek Öğrenci", all_students, format_func=lambda s: s['name'], key="student_select_manage")
         if selected_student_manage:
-            student_index = next((i for i, s in enumerate(all_students) if s['id'] == selected_student_manage['id']), None)
+            student_index = student_position(st.session_state.app, selected_student_manage['id'])
             if student_index is not None:
-                due_date = selected_student_manage.get("next_payment_due_date")
-                if due_date and date.today() > due_date:
-                    overdue_days = (date.today() - due_date).days
-                    st.error(f"Ödeme Durumu: {overdue_days} gün gecikmede!")
+                pay_info = payment_status(st.session_state.app)[selected_student_manage['id']]
+                due_date = pay_info["due"]
+                if pay_info["overdue_days"] > 0:
+                    st.error(f"Ödeme Durumu: {pay_info['overdue_days']} gün gecikmede!")
                 elif due_date:
                     st.info(f"Sonraki Ödeme: {due_date.strftime('%d %B %Y')}")
                 else:
@@ -185,80 +219,120 @@ with st.sidebar:
                     parent_phone = st.text_input("Veli Telefonu", value=selected_student_manage.get('parent_phone', ''))
                     dob = st.date_input("Doğum Tarihi", value=selected_student_manage.get('dob'), min_value=datetime(1950,1,1).date(), max_value=date.today())
                     if st.form_submit_button("Bilgileri Kaydet", use_container_width=True):
-                        all_students[student_index]['name'] = new_name; all_students[student_index]['parent_name'] = parent_name; all_students[student_index]['parent_phone'] = parent_phone; all_students[student_index]['dob'] = dob
-                        save_state()
-                        st.success(f"{new_name} bilgileri güncellendi.")
-                        st.rerun()
+                        if commit({"op": "update_student", "id": all_students[student_index]['id'], "name": new_name, "parent_name": parent_name, "parent_phone": parent_phone, "dob": dob.isoformat() if dob else None}):
+                            st.success(f"{new_name} bilgileri güncellendi.")
+                            st.rerun()
+@profiled_fragment("sidebar.payment")
+def payment_panel():
     with st.expander("💰 Ödeme Yönetimi"):
         st.write("Aylık Ödeme Takibi")
         all_students = st.session_state.app["students"]
         student_for_payment = st.selectbox("Öğrenci Seç", all_students, format_func=lambda s: s['name'], key="student_payment")
         if student_for_payment:
-            student_index = next((i for i, s in enumerate(all_students) if s['id'] == student_for_payment['id']), None)
-            due_date = student_for_payment.get("next_payment_due_date")
+            student_index = student_position(st.session_state.app, student_for_payment['id'])
+            pay_info = payment_status(st.session_state.app)[student_for_payment['id']]
+            due_date = pay_info["due"]
             st.markdown("##### Güncel Durum"); 
-            if due_date and date.today() > due_date:
-                st.error(f"{(date.today() - due_date).days} GÜN GECİKMEDE")
+            if pay_info["overdue_days"] > 0:
+                st.error(f"{pay_info['overdue_days']} GÜN GECİKMEDE")
             elif due_date: st.success(f"ÖDENDİ")
             else: st.warning("İlk ödeme bekleniyor.")
             st.info(f"Sonraki Ödeme Tarihi: **{due_date.strftime('%d %B %Y') if due_date else 'Belirsiz'}**")
             st.markdown("---"); st.markdown("##### Ödeme Kaydı")
             if st.button("Ödeme Alındı", use_container_width=True, type="primary"):
-                payment_date = date.today()
-                payment_day = all_students[student_index].get("payment_day", 1)
-                next_due_date = payment_date + relativedelta(months=1)
-                try: next_due_date = next_due_date.replace(day=payment_day)
-                except ValueError: next_due_date = (next_due_date + relativedelta(months=1)).replace(day=1) - timedelta(days=1)
-                all_students[student_index]["last_payment_date"] = payment_date
-                all_students[student_index]["next_payment_due_date"] = next_due_date
-                if payment_date not in all_students[student_index]["payment_history"]:
-                    all_students[student_index]["payment_history"].insert(0, payment_date)
-                save_state()
-                st.success(f"Ödeme kaydedildi. Sonraki ödeme: {next_due_date.strftime('%d %B %Y')}")
-                st.rerun()
+                if commit({"op": "add_payment", "id": all_students[student_index]["id"], "date": date.today().isoformat()}):
+                    next_due_date = all_students[student_index]["next_payment_due_date"]
+                    st.success(f"Ödeme kaydedildi. Sonraki ödeme: {next_due_date.strftime('%d %B %Y')}")
+                    st.rerun()
             with st.form("past_payment_form"):
                 st.markdown("###### Geçmiş Bir Ödemeyi Ekle")
                 past_payment_date = st.date_input("Ödemenin Alındığı Tarih", max_value=date.today())
                 if st.form_submit_button("Geçmiş Ödemeyi Kaydet"):
-                    history = all_students[student_index]["payment_history"]
+                    history = payment_history(all_students[student_index])
                     if past_payment_date not in history:
-                        history.append(past_payment_date)
-                        history.sort(reverse=True)
-                        last_payment = history[0]
-                        payment_day = all_students[student_index].get("payment_day", 1)
-                        next_due_date = last_payment + relativedelta(months=1)
-                        try: next_due_date = next_due_date.replace(day=payment_day)
-                        except ValueError: next_due_date = (next_due_date + relativedelta(months=1)).replace(day=1) - timedelta(days=1)
-                        all_students[student_index]["last_payment_date"] = last_payment
-                        all_students[student_index]["next_payment_due_date"] = next_due_date
-                        save_state()
-                        st.success(f"Geçmiş ödeme {past_payment_date.strftime('%d %b')} tarihinde kaydedildi.")
-                        st.rerun()
+                        if commit({"op": "add_payment", "id": all_students[student_index]["id"], "date": past_payment_date.isoformat()}):
+                            st.success(f"Geçmiş ödeme {past_payment_date.strftime('%d %b')} tarihinde kaydedildi.")
+                            st.rerun()
                     else: st.warning("Bu tarihte zaten bir ödeme kaydı var.")
             st.markdown("---"); st.markdown("##### Ödeme Geçmişi")
-            history = student_for_payment.get("payment_history", [])
+            history = payment_history(student_for_payment)
             if not history: st.write("Kayıtlı ödeme yok.")
             else:
                 for p_date in history:
                     col1, col2 = st.columns([3, 1])
                     col1.text(p_date.strftime('%d %B %Y, %A'))
                     col2.button("Sil", key=f"del_{student_for_payment['id']}_{p_date.isoformat()}", on_click=delete_payment, args=(student_index, p_date), use_container_width=True)
-    with st.expander("⚙️ Mesai Saatleri"):
-        current_wh_start, current_wh_end = st.session_state.app["working_hours"]
+@profiled_fragment("sidebar.working_hours")
+def working_hours_panel():
+    with st.expander("⚙️ Mesai Saatleri ve Kaynaklar"):
+        # Şube varsayılanı, kendi saati olmayan tüm kaynaklara uygulanır; "Genel" dahil her kaynağın saati kendi kaydına yazılır
+        app = st.session_state.app
+        targets = [None] + [r["id"] for r in app["resources"]]
+        resource = st.selectbox("Ayarlanacak", targets, key="hours_resource",
+                                format_func=lambda r: "Şube varsayılanı" if r is None else resource_name(app, r))
+        current_wh_start, current_wh_end = app["working_hours"] if resource is None else resource_hours(app, resource)
+        if resource is None:
+            st.caption("Kendi mesai saati olmayan tüm eğitmen / odalara uygulanır.")
+        elif not find_resource(app, resource).get("working_hours"):
+            st.caption("Şu an şube varsayılanını kullanıyor; değiştirirsen yalnızca bu kaynağa uygulanır.")
         time_str_list = [t.strftime('%H:%M') for t in TIME_SLOTS]
         start_index = time_str_list.index(current_wh_start.strftime('%H:%M'))
         end_index = time_str_list.index(current_wh_end.strftime('%H:%M'))
-        wh_start_str = st.selectbox("Gün Başlangıcı", time_str_list, index=start_index)
-        wh_end_str = st.selectbox("Gün Bitişi", time_str_list, index=end_index)
+        wh_start_str = st.selectbox("Gün Başlangıcı", time_str_list, index=start_index, key=f"wh_start_{resource}")
+        wh_end_str = st.selectbox("Gün Bitişi", time_str_list, index=end_index, key=f"wh_end_{resource}")
         whs = datetime.strptime(wh_start_str, '%H:%M').time()
         whe = datetime.strptime(wh_end_str, '%H:%M').time()
-        if (whs, whe) != st.session_state.app["working_hours"]:
+        if (whs, whe) != (current_wh_start, current_wh_end):
             if to_dt(whs) >= to_dt(whe):
                 st.warning("Başlangıç, bitişten önce olmalı.")
             else:
-                st.session_state.app["working_hours"] = (whs, whe)
-                save_state()
-                st.rerun()
+                op = {"op": "set_working_hours", "start": whs.strftime('%H:%M:%S'), "end": whe.strftime('%H:%M:%S')}
+                if commit(op if resource is None else {**op, "resource": resource}):
+                    st.rerun()
+        with st.form("add_resource_form", clear_on_submit=True):
+            new_resource = st.text_input("Yeni Eğitmen / Oda")
+            if st.form_submit_button("Kaynak Ekle", use_container_width=True):
+                if commit({"op": "add_resource", "id": next_resource_id(st.session_state.app), "name": new_resource.strip()}):
+                    st.success(f"Eklendi: {new_resource.strip()}")
+                    st.rerun()
+@profiled_fragment("sidebar.import_export")
+def import_export_panel():
+    with st.expander("📥 Toplu İçe / Dışa Aktarma (CSV)"):
+        kind = st.selectbox("Veri", list(CSV_KINDS), format_func=CSV_KINDS.get, key="csv_kind")
+        app = st.session_state.app
+        # download_button veriyi bellekte ister; dosya yalnızca istenince üretilir ve indirilince bırakılır
+        if st.button(f"{CSV_KINDS[kind]} CSV hazırla", use_container_width=True, key="csv_prepare"):
+            st.session_state.csv_export = (kind, "".join(iter_export(app, kind)).encode("utf-8-sig"))
+        prepared = st.session_state.get("csv_export")
+        if prepared and prepared[0] == kind:
+            st.download_button(f"⬇️ {CSV_KINDS[kind]} CSV indir", prepared[1], file_name=f"ritim_{kind}.csv", mime="text/csv",
+                               use_container_width=True, on_click=lambda: st.session_state.pop("csv_export", None))
+        # Başarılı içe aktarmadan sonra anahtar değişir; aynı dosya yeniden planlanıp iki kez alınamaz
+        upload_round = st.session_state.get("csv_upload_round", 0)
+        uploaded = st.file_uploader("CSV yükle", type="csv", key=f"csv_upload_{kind}_{upload_round}")
+        allow_duplicates = kind == "students" and st.checkbox("Aynı adlı yeni öğrenci eklemeye izin ver", key="csv_allow_duplicates")
+        if uploaded:
+            uploaded.seek(0)
+            ops, errors = plan_import(app, kind, io.TextIOWrapper(uploaded, encoding="utf-8-sig", newline=""), allow_duplicates)
+            if errors:
+                st.error(f"{len(errors)} satırda hata var; düzeltilene kadar hiçbir kayıt alınmaz.")
+                for error in errors[:20]: st.caption(error)
+            elif not ops:
+                st.info("Dosyada kayıt bulunamadı.")
+            elif st.button(f"{len(ops)} kaydı içe aktar", use_container_width=True, type="primary"):
+                if commit_batch(ops, allow_duplicates):
+                    st.session_state.csv_upload_round = upload_round + 1
+                    st.success(f"{len(ops)} kayıt içe aktarıldı.")
+                    st.rerun()
+with st.sidebar:
+    if len(BRANCHES) > 1:
+        st.selectbox("Şube", BRANCHES, key="branch", on_change=lambda: st.session_state.update(selected_lesson=None))
+    add_lesson_panel()
+    suggest_slots_panel()
+    student_management_panel()
+    payment_panel()
+    working_hours_panel()
+    import_export_panel()
     st.divider()
     if os.path.exists(LOGO_FILE):
         st.image(LOGO_FILE, use_container_width=True)
@@ -267,87 +341,120 @@ with st.sidebar:
 if 'action' in st.query_params and 'day' in st.query_params and 'start' in st.query_params:
     day = st.query_params['day']
     start_time = datetime.strptime(st.query_params['start'], '%H:%M:%S').time()
-    lesson_index, lesson = next(
-        ((idx, l) for idx, l in enumerate(st.session_state.app["schedule"].get(day, [])) if l['start'] == start_time), (None, None))
+    if 'week' in st.query_params: st.session_state.selected_week = st.query_params['week']
+    lesson = week_lesson(st.session_state.app, st.session_state.selected_week, day, start_time, st.query_params.get('resource', DEFAULT_RESOURCE))
     if lesson:
-        st.session_state.selected_lesson = {"lesson": lesson, "day": day, "index": lesson_index}
+        st.session_state.selected_lesson = {"lesson": lesson, "day": day, "week": st.session_state.selected_week}
     st.query_params.clear()
 if st.session_state.selected_lesson:
     info = st.session_state.selected_lesson
     lesson = info["lesson"]
     @st.dialog(f"Ders Durumunu Güncelle")
     def status_popup():
-        st.markdown(f"**Öğrenci:** {lesson['student']}")
-        st.markdown(f"**Zaman:** {info['day']} {hhmm(lesson['start'])} - {hhmm(lesson['end'])}")
+        st.markdown(f"**Öğrenci:** {lesson_student_name(st.session_state.app, lesson)}")
+        st.markdown(f"**Eğitmen / Oda:** {resource_name(st.session_state.app, lesson['resource'])}")
+        st.markdown(f"**Zaman:** {info['day']} {lesson['date'].strftime('%d.%m.%Y')} {hhmm(lesson['start'])} - {hhmm(lesson['end'])}" + (" (telafi)" if lesson["makeup"] else ""))
         st.markdown("---")
-        c1, c2, c3 = st.columns(3)
+        c1, c2, c3, c4 = st.columns(4)
         if c1.button("✅ Yapıldı", use_container_width=True, type="primary"):
-            update_status_and_close(info['day'], info['index'], "Yapıldı"); st.rerun()
+            update_status_and_close(info['week'], info['day'], lesson['start'], "Yapıldı", lesson["resource"]); st.rerun()
         if c2.button("👤 Yapılmadı (Öğrenci)", use_container_width=True):
-            update_status_and_close(info['day'], info['index'], "Yapılmadı-Öğrenci"); st.rerun()
+            update_status_and_close(info['week'], info['day'], lesson['start'], "Yapılmadı-Öğrenci", lesson["resource"]); st.rerun()
         if c3.button("👨‍🏫 Yapılmadı (Eğitmen)", use_container_width=True):
-            update_status_and_close(info['day'], info['index'], "Yapılmadı-Eğitmen"); st.rerun()
-    status_popup()
+            update_status_and_close(info['week'], info['day'], lesson['start'], "Yapılmadı-Eğitmen", lesson["resource"]); st.rerun()
+        if c4.button("🚫 Bu Hafta İptal", use_container_width=True):
+            update_status_and_close(info['week'], info['day'], lesson['start'], "İptal", lesson["resource"]); st.rerun()
+        st.markdown("---")
+        if lesson["makeup"]:
+            if st.button("🗑️ Telafi Dersini Sil", use_container_width=True):
+                commit(with_resource({"op": "delete_makeup", "week": info['week'], "day": info['day'], "start": lesson['start'].strftime('%H:%M:%S')}, lesson["resource"]))
+                st.session_state.selected_lesson = None; st.rerun()
+        elif st.button(f"🗑️ Dersi Sil ({info['week']} haftasından itibaren)", use_container_width=True):
+            commit(with_resource({"op": "delete_lesson", "day": info['day'], "start": lesson['start'].strftime('%H:%M:%S'), "until": info['week']}, lesson["resource"]))
+            st.session_state.selected_lesson = None; st.rerun()
+    with phase("popup"):
+        status_popup()
 # CSS Kodları
-st.markdown("""<style>.table-container { height: 75vh; overflow-y: auto; } .schedule-table { width: 100%; border-collapse: collapse; table-layout: fixed; font-size: 13px; } .schedule-table th, .schedule-table td { border: 1px solid rgba(255,255,255,0.15); padding: 0; text-align: center; vertical-align: top; } .schedule-table thead th { position: sticky; top: -1px; background: rgba(17, 17, 17, 0.95); z-index: 10; padding: 6px 8px; } .time-col { position: sticky; left: 0; background: rgba(17, 17, 17, 0.95); font-weight: 700; width: 80px; z-index: 11; padding: 6px 8px; } .lesson-link { display: block; height: 100%; text-decoration: none; color: white; padding: 6px 8px; } .cell-text { line-height: 1.3; } .cell-text small { opacity: .8; } .cell-occupied { background: #2F3C7E; } .cell-done { background: #1E5128; } .cell-student-absent { background: #D04E00; } .cell-teacher-absent { background: #A04000; } </style>""", unsafe_allow_html=True)
-# Tablo Render
-def render_table_html() -> str:
-    wh_start, wh_end = st.session_state.app["working_hours"]
-    html = ['<table class="schedule-table">']
-    html.append("<thead><tr><th class='time-col'>Saat</th>")
-    for d in DAYS: html.append(f"<th>{d}</th>")
-    html.append("</tr></thead><tbody>")
-    skip = set()
-    for row_idx, slot_start in enumerate(TIME_SLOTS):
-        if slot_start == time(22, 0): continue
-        row_html = [f'<td class="time-col">{hhmm(slot_start)}</td>']
-        for day in DAYS:
-            key = (day, row_idx)
-            if key in skip: continue
-            ev = next((cand for cand in st.session_state.app["schedule"].get(day, []) if cand["start"] == slot_start), None)
-            if ev:
-                span = duration_to_slots(ev["start"], ev["end"])
-                for k in range(1, span): skip.add((day, row_idx + k))
-                status = ev.get("status", "Planlandı")
-                color_map = {"Planlandı": "cell-occupied", "Yapıldı": "cell-done", "Yapılmadı-Öğrenci": "cell-student-absent", "Yapılmadı-Eğitmen": "cell-teacher-absent"}
-                cls = color_map.get(status, "cell-occupied")
-                link_href = f"?action=edit_lesson&day={day}&start={ev['start'].strftime('%H:%M:%S')}"
-                cell_content = (f"<a href='{link_href}' target='_self' class='lesson-link'><div class='cell-text'><b>{ev['student']}</b><br><small>{hhmm(ev['start'])}–{hhmm(ev['end'])}</small><br><small><i>{status}</i></small></div></a>")
-                row_html.append(f'<td class="{cls}" rowspan="{span}">{cell_content}</td>')
-            else:
-                if to_dt(slot_start) < to_dt(wh_start) or to_dt(slot_start) >= to_dt(wh_end):
-                    row_html.append('<td style="background:rgba(0,0,0,0.3);"></td>')
-                else:
-                    row_html.append('<td></td>')
-        html.append("<tr>" + "".join(row_html) + "</tr>")
-    html.append("</tbody></table>")
-    return "\n".join(html)
-table_html = render_table_html()
-st.markdown(f'<div class="table-container">{table_html}</div>', unsafe_allow_html=True)
+st.markdown("""<style>.table-container { height: 75vh; overflow-y: auto; } .schedule-table { width: 100%; border-collapse: collapse; table-layout: fixed; font-size: 13px; } .schedule-table th, .schedule-table td { border: 1px solid rgba(255,255,255,0.15); padding: 0; text-align: center; vertical-align: top; } .schedule-table thead th { position: sticky; top: -1px; background: rgba(17, 17, 17, 0.95); z-index: 10; padding: 6px 8px; } .time-col { position: sticky; left: 0; background: rgba(17, 17, 17, 0.95); font-weight: 700; width: 80px; z-index: 11; padding: 6px 8px; } .lesson-link { display: block; height: 100%; text-decoration: none; color: white; padding: 6px 8px; } .cell-text { line-height: 1.3; } .cell-text small { opacity: .8; } .cell-occupied { background: #2F3C7E; } .cell-done { background: #1E5128; } .cell-student-absent { background: #D04E00; } .cell-teacher-absent { background: #A04000; } .cell-cancelled { background: #444444; } </style>""", unsafe_allow_html=True)
+@profiled_fragment("render")
+def schedule_grid():
+    week = st.session_state.selected_week
+    c1, c2, c3, c4 = st.columns([1, 1, 1, 3])
+    # Seçili hafta kenar çubuğundaki panellerce de kullanılır; yalnızca bu fragment değil tüm sayfa yenilenir
+    for col, label, weeks in ((c1, "◀ Önceki Hafta", -1), (c2, "Bu Hafta", 0), (c3, "Sonraki Hafta ▶", 1)):
+        if col.button(label, use_container_width=True):
+            shift_selected_week(weeks)
+            st.rerun(scope="app")
+    monday = week_monday(week)
+    c4.markdown(f"**{week}** · {monday.strftime('%d.%m.%Y')} – {(monday + timedelta(days=5)).strftime('%d.%m.%Y')}")
+    app = st.session_state.app
+    resources = [r["id"] for r in app["resources"]]
+    if len(resources) == 1:
+        shown = resources
+    elif st.radio("Görünüm", ["Tek kaynak", "Yan yana"], horizontal=True, key="grid_view") == "Tek kaynak":
+        shown = [st.selectbox("Eğitmen / Oda", resources, format_func=lambda r: resource_name(app, r), key="grid_resource")]
+    else:
+        shown = st.multiselect("Eğitmen / Oda", resources, default=resources[:2], format_func=lambda r: resource_name(app, r), key="grid_resources")
+    if not shown: st.info("Gösterilecek eğitmen / oda seçin.")
+    # Yalnızca seçilen kaynakların tabloları üretilir
+    for col, resource in zip(st.columns(len(shown)) if len(shown) > 1 else [st.container()], shown):
+        if len(shown) > 1: col.markdown(f"**{resource_name(app, resource)}**")
+        col.markdown(f'<div class="table-container">{render_table_html(app, week, resource, view_cache(), current_branch())}</div>', unsafe_allow_html=True)
+
+@profiled_fragment("summary")
+def student_summary():
+    app = st.session_state.app
+    summary = memoized(view_cache(), "summary", app.get("_students_version", 0), lambda: student_fault_summary(app))
+    with st.expander("📊 Öğrenci Bazlı Özet (Yapılmayan Dersler)"):
+        for row in summary:
+            st.markdown(f"**{row['Öğrenci']}**")
+            st.markdown(f"- Telafi Sayısı: **{row['Telafi']}** (Öğrenci: {row['Öğrenci Kaynaklı']} - Eğitmen: {row['Eğitmen Kaynaklı']})")
+        if not summary:
+            st.info("Yapılmamış ders bulunmuyor.")
+    with st.expander("🏆 En Çok Telafi Borcu Olanlar"):
+        if summary:
+            st.dataframe(summary, use_container_width=True, hide_index=True)
+        else:
+            st.info("Telafi borcu olan öğrenci yok.")
+
+@profiled_fragment("aging")
+def aging_panel():
+    counts, debtors = aging_report(st.session_state.app)
+    with st.expander(f"💸 Ödeme Yaşlandırma Raporu ({len(debtors)} gecikmede)"):
+        for col, bucket in zip(st.columns(len(AGING_BUCKETS)), AGING_BUCKETS):
+            col.metric(label=bucket, value=counts[bucket])
+        if debtors:
+            st.dataframe(debtors, use_container_width=True, hide_index=True)
+        else:
+            st.success("Gecikmede ödeme bulunmuyor.")
+
+@profiled_fragment("stats")
+def statistics_panel():
+    app = st.session_state.app
+    hours_key = (app["working_hours"], tuple((r["id"], r.get("working_hours")) for r in app["resources"]))
+    stats, per_resource = memoized(view_cache(), "stats", (schedule_version_key(app), hours_key),
+                                   lambda: (calculate_statistics(app), {r["id"]: calculate_statistics(app, r["id"]) for r in app["resources"]}))
+    with st.expander("📈 Haftalık İstatistikler", expanded=True):
+        col1, col2, col3 = st.columns(3)
+        col1.metric(label="Doluluk Oranı", value=f"{stats['occupancy_rate']:.1f}%")
+        col2.metric(label="Dolu Saatler", value=f"{stats['filled_hours']:.1f} saat")
+        col3.metric(label="Boş Saatler", value=f"{stats['empty_hours']:.1f} saat")
+        if len(per_resource) > 1:
+            st.dataframe([{"Eğitmen / Oda": resource_name(app, r), "Doluluk (%)": round(s["occupancy_rate"], 1), "Dolu (saat)": round(s["filled_hours"], 1),
+                           "Boş (saat)": round(s["empty_hours"], 1)} for r, s in per_resource.items()], use_container_width=True, hide_index=True)
+
+schedule_grid()
 # Öğrenci Bazlı Özet ve İstatistikler
 st.divider()
-with st.expander("📊 Öğrenci Bazlı Özet (Yapılmayan Dersler)"):
-    any_uncompleted = False
-    for s_obj in st.session_state.app["students"]:
-        student_fault = 0
-        teacher_fault = 0
-        for d in DAYS:
-            for ev in st.session_state.app["schedule"].get(d, []):
-                if ev["student"] == s_obj['name']:
-                    if ev.get("status") == "Yapılmadı-Öğrenci":
-                        student_fault += 1
-                    elif ev.get("status") == "Yapılmadı-Eğitmen":
-                        teacher_fault += 1
-        total_uncompleted = student_fault + teacher_fault
-        if total_uncompleted > 0:
-            any_uncompleted = True
-            st.markdown(f"**{s_obj['name']}**")
-            st.markdown(f"- Telafi Sayısı: **{total_uncompleted}** (Öğrenci: {student_fault} - Eğitmen: {teacher_fault})")
-    if not any_uncompleted:
-        st.info("Yapılmamış ders bulunmuyor.")
-stats = calculate_statistics()
-with st.expander("📈 Haftalık İstatistikler", expanded=True):
-    col1, col2, col3 = st.columns(3)
-    col1.metric(label="Doluluk Oranı", value=f"{stats['occupancy_rate']:.1f}%")
-    col2.metric(label="Dolu Saatler", value=f"{stats['filled_hours']:.1f} saat")
-    col3.metric(label="Boş Saatler", value=f"{stats['empty_hours']:.1f} saat")
\ No newline at end of file
+student_summary()
+aging_panel()
+statistics_panel()
+finish_profile()
+
+if DEBUG:
+    with st.expander(f"🛠 Performans (son {PROFILE_HISTORY} çalıştırma)"):
+        history = list(reversed(st.session_state.profile_history))
+        slowest = max(history, key=lambda r: r["total_ms"])
+        st.caption(f"En yavaş: {slowest['kind']} · {slowest['total_ms']:.0f} ms ({slowest['at']}) · Günlük: {PROFILE_LOG_FILE}")
+        st.dataframe([{"Zaman": r["at"], "Tür": r["kind"], "Toplam (ms)": r["total_ms"], **r["phases"], "Kayıt": r["saves"], "İşlem": r["commits"],
+                       "Bayt": r["bytes_written"], "Satır": r["rows_written"]} for r in history], use_container_width=True, hide_index=True)
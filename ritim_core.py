@@ -0,0 +1,1356 @@
+"""Ders planı, öğrenci ve ödeme verisinin Streamlit'ten bağımsız çekirdeği.
+
+davul.py arayüzü ve benchmark.py ölçüm takımı bu modülü kullanır; buradaki hiçbir fonksiyon
+st.session_state'e dokunmaz, tüm durum ``app`` sözlüğü olarak parametreyle verilir.
+"""
+from datetime import datetime, time, timedelta, date
+from typing import List, Dict, Any, Iterable, Iterator
+from collections import OrderedDict
+from contextlib import contextmanager
+import csv
+import io
+import json
+from bisect import bisect_left, bisect_right
+import os
+import pickle
+import re
+import sqlite3
+import threading
+from time import perf_counter
+from urllib.parse import quote
+from dateutil.relativedelta import relativedelta
+
+# ---------- Sabitler ----------
+DAYS = ["Pazartesi", "Salı", "Çarşamba", "Perşembe", "Cuma", "Cumartesi"]
+TIME_SLOTS: List[time] = [time(h, m) for h in range(8, 22) for m in (0, 30)]
+if time(22, 0) not in TIME_SLOTS:
+    TIME_SLOTS.append(time(22, 0))
+DATA_FILE = "ritim_data.json"
+JOURNAL_FILE = "ritim_data.journal"
+JOURNAL_MAX_BYTES = 256 * 1024  # Bu boyutu geçen günlük, anlık görüntüye sıkıştırılır
+SNAPSHOT_FILE = "ritim_data.cache"  # Çözülmüş durumun pickle kopyası; JSON'un mtime/boyutu değişince geçersizleşir
+WEEKS_DIR = "ritim_weeks"  # JSON arka ucunda haftalık değişiklikler: ritim_weeks/2025-W36.json
+WEEK_CACHE_SIZE = 8  # Bellekte tutulan hafta sayısı (LRU; haftanın tüm kaynak görünümleri birlikte sayılır)
+DB_FILE = "ritim_data.db"
+STORAGE_BACKEND = os.environ.get("RITIM_STORAGE", "json")  # "json" veya "sqlite"
+BRANCHES = [b.strip() for b in os.environ.get("RITIM_BRANCHES", "Merkez").split(",") if b.strip()]  # İlk şube mevcut ritim_data.* dosyalarını kullanır
+DEFAULT_RESOURCE = "genel"  # Kaynağı (eğitmen/oda) belirtilmemiş dersler ve eski kayıtlar bu kaynağa aittir
+COUNTED_STATUSES = ("Yapıldı", "Yapılmadı-Öğrenci", "Yapılmadı-Eğitmen")  # Öğrenci başına sayaç tutulan durumlar
+SCHEMA_VERSION = 2  # Kayıtlı veri düzeni; daha eski dosyalar deserialize_state ile bir kez güncellenir
+
+# ---------- State (JSON Dosyası ile Veri Yönetimi) ----------
+# Varsayılan arka uçta kalıcı durum iki parçadan oluşur: ritim_data.json anlık görüntüsü
+# ve yanındaki ritim_data.journal günlüğü. Her değişiklik günlüğe tek satırlık bir kayıt
+# olarak eklenir; günlük JOURNAL_MAX_BYTES'ı geçince anlık görüntü atomik olarak yenilenir.
+def serialize_state(app: Dict[str, Any]) -> Dict[str, Any]:
+    # "_" ile başlayanlar geçici indekslerdir; haftalar depolamada ayrı tutulur
+    data_to_save = {k: v for k, v in app.items() if not k.startswith("_") and k != "weeks"}
+    schedule_str = {day: [] for day in DAYS}
+    for day, lessons in data_to_save.get("schedule", {}).items():
+        for lesson in lessons:
+            lesson_copy = lesson.copy()
+            lesson_copy["start"] = lesson["start"].strftime('%H:%M:%S')
+            lesson_copy["end"] = lesson["end"].strftime('%H:%M:%S')
+            schedule_str[day].append(lesson_copy)
+    data_to_save["schedule"] = schedule_str
+    students_str = []
+    for student in data_to_save.get("students", []):
+        student_copy = student.copy()
+        for key in ["dob", "next_payment_due_date", "last_payment_date"]:
+             if student_copy.get(key) and isinstance(student_copy[key], date):
+                student_copy[key] = student_copy[key].isoformat()
+        if "payment_history" in student_copy:
+            student_copy["payment_history"] = [d if isinstance(d, str) else d.isoformat() for d in student_copy["payment_history"]]
+        students_str.append(student_copy)
+    data_to_save["students"] = students_str
+    data_to_save["working_hours"] = [t.strftime('%H:%M:%S') for t in data_to_save["working_hours"]]
+    data_to_save["resources"] = [{**r, "working_hours": [t.strftime('%H:%M:%S') for t in r["working_hours"]] if r.get("working_hours") else None}
+                                 for r in data_to_save.get("resources", default_resources())]
+    return data_to_save
+
+def deserialize_state(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Kayıtlı veriyi bellekteki biçime çevirir; eski düzen düzeltmeleri yalnızca schema_version eskiyse çalışır.
+
+    Ödeme geçmişleri ISO metni olarak kalır ve payment_history() ile ilk erişimde çözülür.
+    """
+    legacy = data.get("schema_version", 0) < SCHEMA_VERSION
+    if legacy and data.get("students"):
+        migrated_students = []
+        for i, student_data in enumerate(data["students"]):
+            if isinstance(student_data, str): 
+                migrated_students.append({"id": i + 1, "name": student_data, "parent_name": "", "parent_phone": "", "dob": None, "payment_day": 1, "next_payment_due_date": None, "last_payment_date": None, "payment_history": []})
+            else:
+                student_data.pop("credits", None)
+                if "payment_day" not in student_data: student_data["payment_day"] = 1
+                if "next_payment_due_date" not in student_data: student_data["next_payment_due_date"] = None
+                if "last_payment_date" not in student_data: student_data["last_payment_date"] = None
+                if "payment_history" not in student_data: student_data["payment_history"] = []
+                migrated_students.append(student_data)
+        data["students"] = migrated_students
+    
+    for day, lessons in data.get("schedule", {}).items():
+        for lesson in lessons:
+            lesson["start"] = datetime.strptime(lesson["start"], '%H:%M:%S').time()
+            lesson["end"] = datetime.strptime(lesson["end"], '%H:%M:%S').time()
+    
+    # Dersler öğrenciye id ile bağlanır; eski kayıtlardaki ad, ilk eşleşen öğrencinin id'sine çevrilir.
+    if legacy:
+        name_to_id: Dict[str, int] = {}
+        for student in data.get("students", []): name_to_id.setdefault(student["name"], student["id"])
+        for lessons in data.get("schedule", {}).values():
+            for lesson in lessons:
+                if lesson.get("student_id") is None:
+                    lesson["student_id"] = name_to_id.get(lesson.get("student"))
+                if lesson["student_id"] is not None: lesson.pop("student", None)
+    if legacy and any(student.get("lesson_counts") is None for student in data.get("students", [])):
+        students_by_id = {student["id"]: student for student in data["students"]}
+        missing = {sid for sid, student in students_by_id.items() if student.get("lesson_counts") is None}
+        for sid in missing: students_by_id[sid]["lesson_counts"] = {status: 0 for status in COUNTED_STATUSES}
+        for lessons in data.get("schedule", {}).values():
+            for lesson in lessons:
+                if lesson["student_id"] in missing and lesson.get("status") in COUNTED_STATUSES:
+                    students_by_id[lesson["student_id"]]["lesson_counts"][lesson["status"]] += 1
+
+    for student in data.get("students", []):
+        for key in ["dob", "next_payment_due_date", "last_payment_date"]:
+            if student.get(key):
+                try: student[key] = datetime.fromisoformat(student[key]).date()
+                except (ValueError, TypeError): student[key] = None
+
+    data["working_hours"] = tuple(datetime.strptime(t, '%H:%M:%S').time() for t in data["working_hours"])
+    data["resources"] = [{**r, "working_hours": tuple(datetime.strptime(t, '%H:%M:%S').time() for t in r["working_hours"]) if r.get("working_hours") else None}
+                         for r in data.get("resources") or default_resources()]
+    data.setdefault("journal_seq", 0)
+    data["schema_version"] = SCHEMA_VERSION
+    return data
+
+def default_state() -> Dict[str, Any]:
+    return {"students": [{"id": i, "name": f"Öğrenci {i}", "parent_name": "", "parent_phone": "", "dob": None, "payment_day": 1, "next_payment_due_date": None, "last_payment_date": None, "payment_history": [], "lesson_counts": {status: 0 for status in COUNTED_STATUSES}} for i in range(1, 41)],"schedule": {day: [] for day in DAYS},"working_hours": (time(8, 0), time(22, 0)), "resources": default_resources(), "journal_seq": 0, "schema_version": SCHEMA_VERSION}
+
+def default_resources() -> List[Dict[str, Any]]:
+    return [{"id": DEFAULT_RESOURCE, "name": "Genel", "working_hours": None}]
+
+def _write_json_atomic(path: str, data: Dict[str, Any]) -> int:
+    """Dosyayı geçici kopya üzerinden atomik olarak yazar; yazılan bayt sayısını döndürür."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+        f.flush(); os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+def next_due_date(last_payment: date, payment_day: int) -> date:
+    """Son ödemeden bir ay sonraki ödeme günü; ayda o gün yoksa ayın son günü."""
+    next_due_date = last_payment + relativedelta(months=1)
+    try: next_due_date = next_due_date.replace(day=payment_day)
+    except ValueError: next_due_date = (next_due_date + relativedelta(months=1)).replace(day=1) - timedelta(days=1)
+    return next_due_date
+
+_HISTORY_LOCK = threading.Lock()  # Çözme bir kez yapılmalı; yoksa eşzamanlı bir ödeme eklemesi eski listeyle ezilebilir
+def payment_history(student: Dict[str, Any]) -> List[date]:
+    """Öğrencinin ödeme tarihleri (yeniden eskiye); kayıttaki ISO metinleri ilk erişimde çözülür."""
+    history = student.setdefault("payment_history", [])
+    if history and isinstance(history[0], str):
+        with _HISTORY_LOCK:
+            history = student["payment_history"]
+            if isinstance(history[0], str):
+                history = student["payment_history"] = sorted((datetime.fromisoformat(d).date() for d in history), reverse=True)
+    return history
+
+def student_position(app: Dict[str, Any], student_id: int):
+    """Öğrenci id'sinden listedeki sırasına; id -> sıra eşlemesi öğrenci sayısı değişene kadar saklanır."""
+    positions = app.get("_student_pos")
+    if positions is None or len(positions) != len(app["students"]):
+        with state_lock(app):
+            positions = app["_student_pos"] = {s["id"]: i for i, s in enumerate(app["students"])}
+    return positions.get(student_id)
+
+def _find_student(app: Dict[str, Any], student_id: int):
+    pos = student_position(app, student_id)
+    return app["students"][pos] if pos is not None else None
+
+def _count_status(app: Dict[str, Any], student_id, status: str, delta: int):
+    """Bir ders durumunu öğrencinin telafi/yapıldı sayacına ekler (delta=+1) veya düşer (delta=-1)."""
+    student = _find_student(app, student_id)
+    if student and status in COUNTED_STATUSES:
+        counts = student.setdefault("lesson_counts", {s: 0 for s in COUNTED_STATUSES})
+        counts[status] = counts.get(status, 0) + delta
+
+def lesson_student_name(app: Dict[str, Any], lesson: Dict[str, Any]) -> str:
+    student = _find_student(app, lesson.get("student_id"))
+    return student["name"] if student else lesson.get("student", "?")
+
+# ---------- Kaynaklar (Eğitmen / Oda) ----------
+# Her ders bir kaynağa aittir ("resource" alanı; yoksa DEFAULT_RESOURCE). Aynı gün ve saatte farklı
+# kaynaklarda ders olabilir; bir kaynakta ve bir öğrencide çakışma olamaz. Kaynağın kendi mesai
+# saati yoksa şubenin genel app["working_hours"] değeri geçerlidir.
+def lesson_resource(lesson: Dict[str, Any]) -> str:
+    return lesson.get("resource") or DEFAULT_RESOURCE
+
+def find_resource(app: Dict[str, Any], resource: str):
+    return next((r for r in app["resources"] if r["id"] == resource), None)
+
+def resource_hours(app: Dict[str, Any], resource: str = DEFAULT_RESOURCE) -> tuple:
+    found = find_resource(app, resource)
+    return found["working_hours"] if found and found.get("working_hours") else app["working_hours"]
+
+def resource_name(app: Dict[str, Any], resource: str) -> str:
+    found = find_resource(app, resource)
+    return found["name"] if found else resource
+
+def next_resource_id(app: Dict[str, Any]) -> str:
+    numbers = [int(r["id"][1:]) for r in app["resources"] if re.fullmatch(r"k\d+", r["id"])]
+    return f"k{max(numbers, default=1) + 1}"
+
+# ---------- Haftalar (Tarihli Ders Geçmişi) ----------
+# app["schedule"] her hafta tekrar eden ders şablonlarıdır. Belirli bir ISO haftasındaki dersler
+# istendiğinde şablonlardan üretilir; yalnızca değişiklik olan haftalar (durum, iptal, telafi dersi)
+# saklanır ve depolamadan ancak o hafta açıldığında okunur (app["weeks"], LazyWeeks). Kaydedilmiş haftalar,
+# oluşturulmuş hafta LRU'sundan (materialized_week) düşünce bellekten de çıkarılır.
+# Hafta verisi: {"overrides": {"<gün> <HH:MM:SS>": {"status", "student_id", "end"}}, "makeups": [ders, ...]};
+# varsayılan dışındaki kaynakların anahtarı "<kaynak>:<gün> <HH:MM:SS>" biçimindedir (override_key).
+# Şablon "since" haftasından başlar; silinen şablon kaldırılmaz, "until" haftasından itibaren üretilmez
+# (geçmiş haftalar silinen dersi göstermeye devam eder). Çakışma indeksleri yalnızca süren şablonları içerir.
+def week_key(d: date) -> str:
+    year, week, _ = d.isocalendar()
+    return f"{year}-W{week:02d}"
+
+def week_monday(key: str) -> date:
+    year, week = key.split("-W")
+    return date.fromisocalendar(int(year), int(week), 1)
+
+def shift_week(key: str, weeks: int) -> str:
+    return week_key(week_monday(key) + timedelta(weeks=weeks))
+
+def override_key(resource: str, day: str, start: str) -> str:
+    return f"{day} {start}" if resource == DEFAULT_RESOURCE else f"{resource}:{day} {start}"
+
+def parse_override_key(key: str) -> tuple:
+    """override_key'in tersi: (kaynak, gün, "HH:MM:SS")."""
+    resource, _, slot = key.partition(":") if key.count(":") == 3 else ("", "", key)
+    day, start = slot.split(" ", 1)
+    return resource or DEFAULT_RESOURCE, day, start
+
+def template_active(template: Dict[str, Any], week: str) -> bool:
+    return template.get("since", "") <= week and not (template.get("until") and week >= template["until"])
+
+def ended_lesson_conflict(app: Dict[str, Any], day: str, resource: str, student_id, start_m: int, end_m: int, since: str) -> bool:
+    """since haftasından sonra hâlâ geçerli olan, sona erdirilmiş bir şablonla (aynı kaynak ya da öğrenci) çakışma var mı."""
+    candidates = template_index(app, "resource").get((day, resource), []) + template_index(app, "student").get((day, student_id), [])
+    for template in candidates:
+        if not template.get("until") or template["until"] <= (since or ""): continue
+        if to_minutes(template["start"]) < end_m and start_m < to_minutes(template["end"]): return True
+    return False
+
+def empty_week() -> Dict[str, Any]:
+    return {"overrides": {}, "makeups": []}
+
+def encode_week(week: Dict[str, Any]) -> Dict[str, Any]:
+    return {"overrides": {k: {**ov, "end": ov["end"].strftime('%H:%M:%S')} for k, ov in week["overrides"].items()},
+            "makeups": [{**m, "start": m["start"].strftime('%H:%M:%S'), "end": m["end"].strftime('%H:%M:%S')} for m in week["makeups"]]}
+
+def decode_week(data: Dict[str, Any]) -> Dict[str, Any]:
+    week = empty_week()
+    for k, ov in data.get("overrides", {}).items():
+        week["overrides"][k] = {**ov, "end": datetime.strptime(ov["end"], '%H:%M:%S').time()}
+    for m in data.get("makeups", []):
+        week["makeups"].append({**m, "start": datetime.strptime(m["start"], '%H:%M:%S').time(), "end": datetime.strptime(m["end"], '%H:%M:%S').time()})
+    return week
+
+class LazyWeeks(dict):
+    """Hafta anahtarı -> hafta verisi; bellekte olmayan hafta ilk erişimde, durum kilidi altında depolamadan yüklenir."""
+    def __init__(self, loader, lock):
+        super().__init__()
+        self.loader = loader
+        self.lock = lock
+
+    def __missing__(self, key: str) -> Dict[str, Any]:
+        with self.lock:
+            if key in self: return dict.__getitem__(self, key)  # Beklerken başka bir okuyucu yükledi
+            week = self[key] = self.loader(key)
+            return week
+
+def migrate_legacy_statuses(app: Dict[str, Any], week: str) -> bool:
+    """Şablonlarda kalmış eski durumları verilen haftanın değişikliklerine taşır; bir şey taşındıysa True."""
+    moved = False
+    for day, lessons in app["schedule"].items():
+        for lesson in lessons:
+            status = lesson.pop("status", "Planlandı")
+            if status == "Planlandı": continue
+            overrides = app["weeks"][week]["overrides"]
+            overrides.setdefault(override_key(lesson_resource(lesson), day, lesson['start'].strftime('%H:%M:%S')), {"status": status, "student_id": lesson["student_id"], "end": lesson["end"]})
+            app.setdefault("_dirty_weeks", set()).add(week)
+            moved = True
+    return moved
+
+def _find_makeup(week: Dict[str, Any], day: str, start_t: time, resource: str = DEFAULT_RESOURCE):
+    return next((m for m in week["makeups"] if m["day"] == day and m["start"] == start_t and lesson_resource(m) == resource), None)
+
+def touch_week(app: Dict[str, Any], week: str, resource: str = DEFAULT_RESOURCE):
+    """Haftanın ve (hafta, kaynak) ikilisinin sürümünü artırır; kaynak görünümleri yalnızca kendi sürümüne bakar."""
+    versions = app.setdefault("_week_versions", {})
+    versions[week] = versions.get(week, 0) + 1
+    versions[(week, resource)] = versions.get((week, resource), 0) + 1
+    app.setdefault("_dirty_weeks", set()).add(week)
+
+def bump_day_version(app: Dict[str, Any], day: str):
+    """O günün ders listesi değiştiğinde sayacı artırır; günlük indeksler bu sayaca göre yenilenir."""
+    versions = app.setdefault("_day_versions", {})
+    versions[day] = versions.get(day, 0) + 1
+
+# Şablonlar (gün, kaynak) ve (gün, öğrenci) anahtarlarıyla da dizinlenir; tek kaynağın görünümü ve çakışma
+# kontrolü yalnızca kendi şablonlarını dolaşır. Dizinler ilk kullanımda kurulur, sonra template_changed ile güncellenir.
+TEMPLATE_INDEXES = {"resource": lesson_resource, "student": lambda lesson: lesson.get("student_id")}
+def template_index(app: Dict[str, Any], by: str) -> Dict[tuple, List[Dict[str, Any]]]:
+    """(gün, kaynak) ya da (gün, öğrenci id) -> başlangıca göre sıralı şablonlar (sona erenler dahil)."""
+    index = app.get(f"_templates_by_{by}")
+    if index is None:
+        with state_lock(app):
+            index = app.get(f"_templates_by_{by}")
+            if index is None:
+                index = {}
+                for day, lessons in app["schedule"].items():
+                    for lesson in lessons: index.setdefault((day, TEMPLATE_INDEXES[by](lesson)), []).append(lesson)
+                app[f"_templates_by_{by}"] = index
+    return index
+
+def slot_version(app: Dict[str, Any], by: str, day: str, value) -> int:
+    return app.get(f"_{by}_versions", {}).get((day, value), 0)
+
+def template_changed(app: Dict[str, Any], day: str, lesson: Dict[str, Any], added: bool = None):
+    """Şablon eklendi (True), kaldırıldı (False) ya da sona erdirildi (None): dizinleri ve sürümlerini günceller."""
+    for by, group in TEMPLATE_INDEXES.items():
+        key = (day, group(lesson))
+        versions = app.setdefault(f"_{by}_versions", {})
+        versions[key] = versions.get(key, 0) + 1
+        index = app.get(f"_templates_by_{by}")
+        if index is None: continue
+        lessons = index.setdefault(key, [])
+        if added: lessons.insert(bisect_right([l["start"] for l in lessons], lesson["start"]), lesson)
+        elif added is False: lessons[:] = [l for l in lessons if l is not lesson]
+
+def apply_op(app: Dict[str, Any], op: Dict[str, Any]):
+    """Günlükteki tek bir değişiklik kaydını bellekteki duruma uygular (doğrulama çağıran tarafta)."""
+    kind = op["op"]
+    if kind in ("add_lesson", "delete_lesson"):
+        bump_day_version(app, op["day"])
+    if kind in ("set_status", "add_makeup", "delete_makeup"):
+        touch_week(app, op["week"], op.get("resource") or DEFAULT_RESOURCE)
+    if kind in ("add_student", "update_student", "add_payment", "delete_payment", "set_status", "delete_lesson", "delete_makeup"):
+        app["_students_version"] = app.get("_students_version", 0) + 1
+    if kind in ("add_student", "update_student"):
+        app["_names_version"] = app.get("_names_version", 0) + 1
+    if kind in ("add_payment", "delete_payment") or (kind == "update_student" and "payment_day" in op):
+        app["_payments_version"] = app.get("_payments_version", 0) + 1
+    resource = op.get("resource") or DEFAULT_RESOURCE  # Varsayılan kaynak işlemlere yazılmaz
+    if kind == "add_lesson":
+        start_t = datetime.strptime(op["start"], '%H:%M:%S').time()
+        end_t = datetime.strptime(op["end"], '%H:%M:%S').time()
+        lesson = {"student_id": op["student_id"], "start": start_t, "end": end_t}
+        if op.get("since"): lesson["since"] = op["since"]  # Şablonun geçerli olduğu ilk hafta
+        if resource != DEFAULT_RESOURCE: lesson["resource"] = resource
+        app["schedule"][op["day"]].append(lesson)
+        app["schedule"][op["day"]].sort(key=lambda e: e["start"])
+        template_changed(app, op["day"], lesson, added=True)
+    elif kind == "set_status":
+        # Sayaçlar, işlem anında kaydedilen önceki durumla ("prev") güncellenir; böylece hafta dosyası
+        # anlık görüntüden önce yazılmış olsa da günlük tekrar oynatıldığında sayılar kaymaz.
+        start_t = datetime.strptime(op["start"], '%H:%M:%S').time()
+        week = app["weeks"][op["week"]]
+        makeup = _find_makeup(week, op["day"], start_t, resource)
+        if makeup:
+            prev, student_id = makeup["status"], makeup["student_id"]
+            makeup["status"] = op["status"]
+        else:
+            key = override_key(resource, op["day"], op["start"])
+            template = next((l for l in app["schedule"].get(op["day"], []) if l["start"] == start_t and lesson_resource(l) == resource and template_active(l, op["week"])), None)
+            override = week["overrides"].get(key)
+            prev = override["status"] if override else (template or {}).get("status", "Planlandı")
+            student_id = template["student_id"] if template else (override or {}).get("student_id")
+            end_t = template["end"] if template else (override or {}).get("end", start_t)
+            week["overrides"][key] = {"status": op["status"], "student_id": student_id, "end": end_t}
+        op.setdefault("prev", prev)
+        _count_status(app, student_id, op["prev"], -1)
+        _count_status(app, student_id, op["status"], +1)
+    elif kind == "delete_lesson":
+        # Şablon "until" haftasından itibaren sona erer; önceki haftalar, durum kayıtları ve sayaçlar korunur.
+        # Başlamadan (since haftasında ya da öncesinde) silinen şablon tamamen kaldırılır.
+        start_t = datetime.strptime(op["start"], '%H:%M:%S').time()
+        lessons = app["schedule"].get(op["day"], [])
+        for i, lesson in enumerate(lessons):
+            if lesson["start"] == start_t and lesson_resource(lesson) == resource and not lesson.get("until"):
+                if op["until"] > lesson.get("since", ""):
+                    lesson["until"] = op["until"]
+                    template_changed(app, op["day"], lesson)
+                else:
+                    _count_status(app, lesson["student_id"], lesson.get("status"), -1)  # Yalnızca taşınmamış eski durumlar
+                    del lessons[i]
+                    template_changed(app, op["day"], lesson, added=False)
+                break
+    elif kind == "add_makeup":
+        week = app["weeks"][op["week"]]
+        start_t = datetime.strptime(op["start"], '%H:%M:%S').time()
+        if _find_makeup(week, op["day"], start_t, resource) is None:
+            makeup = {"day": op["day"], "start": start_t, "end": datetime.strptime(op["end"], '%H:%M:%S').time(), "student_id": op["student_id"], "status": "Planlandı"}
+            if resource != DEFAULT_RESOURCE: makeup["resource"] = resource
+            week["makeups"].append(makeup)
+    elif kind == "delete_makeup":
+        week = app["weeks"][op["week"]]
+        makeup = _find_makeup(week, op["day"], datetime.strptime(op["start"], '%H:%M:%S').time(), resource)
+        if makeup:
+            op.setdefault("prev", makeup["status"]); op.setdefault("student_id", makeup["student_id"])
+            week["makeups"].remove(makeup)
+        if "prev" in op: _count_status(app, op["student_id"], op["prev"], -1)
+    elif kind == "update_student":
+        student = _find_student(app, op["id"])
+        if student:
+            student["name"] = op["name"]; student["parent_name"] = op["parent_name"]; student["parent_phone"] = op["parent_phone"]
+            student["dob"] = datetime.fromisoformat(op["dob"]).date() if op.get("dob") else None
+            if "payment_day" in op:
+                student["payment_day"] = op["payment_day"]
+                if student["last_payment_date"]: student["next_payment_due_date"] = next_due_date(student["last_payment_date"], op["payment_day"])
+    elif kind == "add_student":
+        app["students"].append({"id": op["id"], "name": op["name"], "parent_name": op.get("parent_name", ""), "parent_phone": op.get("parent_phone", ""),
+                                "dob": datetime.fromisoformat(op["dob"]).date() if op.get("dob") else None, "payment_day": op.get("payment_day", 1),
+                                "next_payment_due_date": None, "last_payment_date": None, "payment_history": [],
+                                "lesson_counts": {status: 0 for status in COUNTED_STATUSES}})
+    elif kind in ("add_payment", "delete_payment"):
+        student = _find_student(app, op["id"])
+        if not student: return
+        payment_date = datetime.fromisoformat(op["date"]).date()
+        history = payment_history(student)
+        if kind == "add_payment" and payment_date not in history: history.append(payment_date)
+        elif kind == "delete_payment" and payment_date in history: history.remove(payment_date)
+        history.sort(reverse=True)
+        if history:
+            student["last_payment_date"] = history[0]
+            student["next_payment_due_date"] = next_due_date(history[0], student.get("payment_day", 1))
+        else:
+            student["last_payment_date"] = None
+            student["next_payment_due_date"] = None
+    elif kind == "set_working_hours":
+        hours = (datetime.strptime(op["start"], '%H:%M:%S').time(), datetime.strptime(op["end"], '%H:%M:%S').time())
+        if op.get("resource"): find_resource(app, op["resource"])["working_hours"] = hours
+        else: app["working_hours"] = hours  # Şubenin genel mesai saatleri
+    elif kind == "add_resource":
+        if find_resource(app, op["id"]) is None:
+            app["resources"].append({"id": op["id"], "name": op["name"], "working_hours": None})
+    else:
+        raise ValueError(f"Bilinmeyen işlem: {kind}")
+
+# ---------- Depolama Katmanı ----------
+# Aynı arayüzü (load / commit / save) sunan iki arka uç vardır; RITIM_STORAGE
+# ortam değişkeni "sqlite" ise SqliteStorage, aksi halde JsonJournalStorage kullanılır.
+# commit / commit_batch / save yaptıkları yazmayı IO_COUNTERS anahtarlı bir sözlükle döndürür (JSON bayt,
+# SQLite satır sayar); çağıran bunu kendi profiline ekler, böylece başka oturumların yazmaları karışmaz.
+IO_COUNTERS = ("commits", "saves", "bytes_written", "rows_written")
+
+def add_io(total: Dict[str, int], written: Dict[str, int]) -> Dict[str, int]:
+    for key, value in written.items(): total[key] = total.get(key, 0) + value
+    return total
+
+class JsonJournalStorage:
+    """ritim_data.json anlık görüntüsü + ritim_data.journal günlüğü.
+
+    Soğuk başlangıçta JSON yerine, JSON'un (şema sürümü, mtime, boyut) anahtarıyla eşleşen
+    ritim_data.cache okunur; anahtar tutmazsa JSON çözülür ve önbellek yeniden yazılır.
+    """
+    def __init__(self, data_file: str = DATA_FILE, journal_file: str = JOURNAL_FILE, weeks_dir: str = WEEKS_DIR, snapshot_file: str = SNAPSHOT_FILE):
+        self.data_file = data_file
+        self.journal_file = journal_file
+        self.weeks_dir = weeks_dir
+        self.snapshot_file = snapshot_file
+
+    def _snapshot_key(self) -> tuple:
+        stat = os.stat(self.data_file)
+        return (SCHEMA_VERSION, stat.st_mtime_ns, stat.st_size)
+
+    def _read_snapshot(self):
+        """Önbellek JSON ile aynı sürümdeyse çözülmüş durumu, değilse None döndürür."""
+        try:
+            with open(self.snapshot_file, 'rb') as f:
+                if pickle.load(f) != self._snapshot_key(): return None
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+            return None
+
+    def _write_snapshot(self, app: Dict[str, Any]) -> int:
+        state = {k: v for k, v in app.items() if not k.startswith("_") and k != "weeks"}
+        tmp_path = self.snapshot_file + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self._snapshot_key(), f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.snapshot_file)
+        return os.path.getsize(self.snapshot_file)
+
+    def _week_path(self, key: str) -> str:
+        return os.path.join(self.weeks_dir, f"{key}.json")
+
+    def load_week(self, key: str) -> Dict[str, Any]:
+        if not os.path.exists(self._week_path(key)): return empty_week()
+        with open(self._week_path(key), 'r', encoding='utf-8') as f:
+            return decode_week(json.load(f))
+
+    def week_keys(self) -> List[str]:
+        if not os.path.isdir(self.weeks_dir): return []
+        return sorted(name[:-5] for name in os.listdir(self.weeks_dir) if name.endswith(".json"))
+
+    def load(self) -> Dict[str, Any]:
+        app = default_state()
+        migrated = False
+        if os.path.exists(self.data_file):
+            app = self._read_snapshot()
+            if app is None:
+                with open(self.data_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                migrated = data.get("schema_version", 0) < SCHEMA_VERSION
+                app = deserialize_state(data)
+                if not migrated: self._write_snapshot(app)
+        app["weeks"] = LazyWeeks(self.load_week, state_lock(app))
+        if os.path.exists(self.journal_file):
+            good_end = 0
+            with open(self.journal_file, 'rb') as f:
+                for raw in f:
+                    try: record = json.loads(raw) if raw.endswith(b"\n") else None
+                    except (json.JSONDecodeError, UnicodeDecodeError): record = None
+                    if record is None: break  # Yarım kalmış son yazım
+                    good_end += len(raw)
+                    if record["seq"] <= app["journal_seq"]: continue  # Zaten anlık görüntüde
+                    apply_op(app, record)
+                    app["journal_seq"] = record["seq"]
+            if good_end < os.path.getsize(self.journal_file):
+                # Yarım satır kesilir; yoksa sonraki eklemeler ona yapışır ve yeniden başlatmada kaybolur.
+                with open(self.journal_file, 'r+b') as f:
+                    f.truncate(good_end)
+        if migrate_legacy_statuses(app, week_key(date.today())) or migrated:
+            self.save(app)
+        return app
+
+    def commit(self, app: Dict[str, Any], op: Dict[str, Any]) -> Dict[str, int]:
+        return self.commit_batch(app, [op])
+
+    def commit_batch(self, app: Dict[str, Any], ops: List[Dict[str, Any]]) -> Dict[str, int]:
+        """İşlemleri günlüğe tek yazım ve tek fsync ile ekler; günlük sıkıştırılırsa onun yazması da sayılır."""
+        lines = []
+        for op in ops:
+            app["journal_seq"] = app.get("journal_seq", 0) + 1
+            lines.append(json.dumps({"seq": app["journal_seq"], **op}, ensure_ascii=False) + "\n")
+        chunk = "".join(lines)
+        with open(self.journal_file, 'a', encoding='utf-8') as f:
+            f.write(chunk)
+            f.flush(); os.fsync(f.fileno())
+            journal_size = f.tell()
+        written = {"commits": 1, "bytes_written": len(chunk.encode('utf-8'))}
+        if journal_size > JOURNAL_MAX_BYTES:
+            add_io(written, self.save(app))
+        return written
+
+    def save(self, app: Dict[str, Any]) -> Dict[str, int]:
+        """Tüm durumu atomik olarak anlık görüntüye yazar ve günlüğü boşaltır (sıkıştırma).
+
+        Değişen haftalar anlık görüntüden önce yazılır: arada kesilirse günlük, hafta kayıtlarını
+        yeniden uygular (hafta işlemleri tekrar uygulanabilir, sayaçlar "prev" ile düzeltilir).
+        """
+        os.makedirs(self.weeks_dir, exist_ok=True)
+        written = 0
+        for key in sorted(app.get("_dirty_weeks", ())):
+            week = app["weeks"][key]
+            if week["overrides"] or week["makeups"]:
+                written += _write_json_atomic(self._week_path(key), encode_week(week))
+            elif os.path.exists(self._week_path(key)):
+                os.remove(self._week_path(key))
+        app["_dirty_weeks"] = set()
+        written += _write_json_atomic(self.data_file, serialize_state(app))
+        written += self._write_snapshot(app)
+        with open(self.journal_file, 'w', encoding='utf-8'): pass
+        return {"saves": 1, "bytes_written": written}
+
+class SqliteStorage:
+    """Öğrenciler, haftalık dersler ve ödemeler için ayrı tablolar; her işlem tek satırlık bir işlemdir."""
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS students (
+            id INTEGER PRIMARY KEY, name TEXT NOT NULL, parent_name TEXT NOT NULL DEFAULT '', parent_phone TEXT NOT NULL DEFAULT '',
+            dob TEXT, payment_day INTEGER NOT NULL DEFAULT 1, next_payment_due_date TEXT, last_payment_date TEXT,
+            done_count INTEGER NOT NULL DEFAULT 0, student_absent_count INTEGER NOT NULL DEFAULT 0, teacher_absent_count INTEGER NOT NULL DEFAULT 0);
+        CREATE TABLE IF NOT EXISTS lessons (
+            day TEXT NOT NULL, start TEXT NOT NULL, end TEXT NOT NULL, student_id INTEGER REFERENCES students (id),
+            student TEXT NOT NULL DEFAULT '', since TEXT, until TEXT, resource TEXT NOT NULL DEFAULT 'genel');
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_lessons_active_slot ON lessons (resource, day, start) WHERE until IS NULL;
+        CREATE INDEX IF NOT EXISTS idx_lessons_student ON lessons (student_id);
+        CREATE TABLE IF NOT EXISTS payments (
+            student_id INTEGER NOT NULL REFERENCES students (id), date TEXT NOT NULL, PRIMARY KEY (student_id, date));
+        CREATE INDEX IF NOT EXISTS idx_payments_date ON payments (date);
+        CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS week_overrides (
+            week TEXT NOT NULL, day TEXT NOT NULL, start TEXT NOT NULL, makeup INTEGER NOT NULL DEFAULT 0,
+            end TEXT NOT NULL, student_id INTEGER REFERENCES students (id), status TEXT NOT NULL, resource TEXT NOT NULL DEFAULT 'genel',
+            PRIMARY KEY (week, resource, day, start, makeup));
+        CREATE TABLE IF NOT EXISTS resources (id TEXT PRIMARY KEY, name TEXT NOT NULL, working_hours_start TEXT, working_hours_end TEXT);
+    """
+
+    def __init__(self, db_file: str = DB_FILE, source: "JsonJournalStorage" = None):
+        self.db_file = db_file
+        self.source = source  # Veritabanı boşsa içeriği aktarılacak JSON deposu (varsayılan: ritim_data.json)
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)  # Yazma da okuma da (load_week) SharedStore kilidi altında
+        self.conn.executescript(self.SCHEMA)
+
+    def load(self) -> Dict[str, Any]:
+        if self.conn.execute("SELECT COUNT(*) FROM settings").fetchone()[0] == 0:
+            migrate_json_to_sqlite(self, self.source)
+        wh = dict(self.conn.execute("SELECT key, value FROM settings"))
+        resources = [{"id": rid, "name": name, "working_hours": [start, end] if start else None}
+                     for rid, name, start, end in self.conn.execute("SELECT id, name, working_hours_start, working_hours_end FROM resources ORDER BY rowid")]
+        history: Dict[int, List[str]] = {}
+        for student_id, payment_date in self.conn.execute("SELECT student_id, date FROM payments ORDER BY student_id, date DESC"):
+            history.setdefault(student_id, []).append(payment_date)
+        students = []
+        for row in self.conn.execute("SELECT id, name, parent_name, parent_phone, dob, payment_day, next_payment_due_date, last_payment_date, done_count, student_absent_count, teacher_absent_count FROM students ORDER BY id"):
+            students.append({"id": row[0], "name": row[1], "parent_name": row[2], "parent_phone": row[3], "dob": row[4], "payment_day": row[5],
+                             "next_payment_due_date": row[6], "last_payment_date": row[7], "payment_history": history.get(row[0], []),
+                             "lesson_counts": dict(zip(COUNTED_STATUSES, row[8:11]))})
+        schedule = {day: [] for day in DAYS}
+        for day, start, end, student, student_id, since, until, resource in self.conn.execute(
+                "SELECT day, start, end, student, student_id, since, until, resource FROM lessons ORDER BY day, start"):
+            lesson = {"student_id": student_id, "start": start, "end": end}
+            if student_id is None: lesson["student"] = student  # ritim_data.json'da öğrencisi bulunamayan dersin adı
+            if since: lesson["since"] = since
+            if until: lesson["until"] = until
+            if resource != DEFAULT_RESOURCE: lesson["resource"] = resource
+            schedule.setdefault(day, []).append(lesson)
+        app = deserialize_state({"students": students, "schedule": schedule, "working_hours": [wh["working_hours_start"], wh["working_hours_end"]], "resources": resources,
+                                 "schema_version": SCHEMA_VERSION})
+        app["weeks"] = LazyWeeks(self.load_week, state_lock(app))
+        return app
+
+    def load_week(self, key: str) -> Dict[str, Any]:
+        week = empty_week()
+        for day, start, makeup, end, student_id, status, resource in self.conn.execute(
+                "SELECT day, start, makeup, end, student_id, status, resource FROM week_overrides WHERE week = ?", (key,)):
+            if makeup:
+                week["makeups"].append({"day": day, "start": datetime.strptime(start, '%H:%M:%S').time(), "end": datetime.strptime(end, '%H:%M:%S').time(),
+                                        "student_id": student_id, "status": status, **({"resource": resource} if resource != DEFAULT_RESOURCE else {})})
+            else:
+                week["overrides"][override_key(resource, day, start)] = {"status": status, "student_id": student_id, "end": datetime.strptime(end, '%H:%M:%S').time()}
+        return week
+
+    def _write_week(self, key: str, week: Dict[str, Any]):
+        self.conn.execute("DELETE FROM week_overrides WHERE week = ?", (key,))
+        rows = [(key, *parse_override_key(k), 0, ov["end"].strftime('%H:%M:%S'), ov["student_id"], ov["status"]) for k, ov in week["overrides"].items()]
+        rows += [(key, lesson_resource(m), m["day"], m["start"].strftime('%H:%M:%S'), 1, m["end"].strftime('%H:%M:%S'), m["student_id"], m["status"]) for m in week["makeups"]]
+        self.conn.executemany("INSERT INTO week_overrides (week, resource, day, start, makeup, end, student_id, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def commit(self, app: Dict[str, Any], op: Dict[str, Any]) -> Dict[str, int]:
+        return self.commit_batch(app, [op])
+
+    def commit_batch(self, app: Dict[str, Any], ops: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Tüm işlemleri tek bir SQLite işleminde (transaction) yazar."""
+        changes = self.conn.total_changes
+        with self.conn:
+            for op in ops: self._write_op(app, op)
+        return {"commits": 1, "rows_written": self.conn.total_changes - changes}
+
+    def _write_op(self, app: Dict[str, Any], op: Dict[str, Any]):
+        kind = op["op"]
+        resource = op.get("resource") or DEFAULT_RESOURCE
+        if kind == "add_lesson":
+            self.conn.execute("INSERT INTO lessons (day, start, end, student_id, since, resource) VALUES (?, ?, ?, ?, ?, ?)",
+                              (op["day"], op["start"], op["end"], op["student_id"], op.get("since"), resource))
+        elif kind == "delete_lesson":
+            slot = (op["day"], op["start"], resource)
+            row = self.conn.execute("SELECT student_id, since FROM lessons WHERE day = ? AND start = ? AND resource = ? AND until IS NULL", slot).fetchone()
+            if row and op["until"] > (row[1] or ""):  # apply_op ile aynı kural: şablon sona erdirilir
+                self.conn.execute("UPDATE lessons SET until = ? WHERE day = ? AND start = ? AND resource = ? AND until IS NULL", (op["until"], *slot))
+            else:
+                self.conn.execute("DELETE FROM lessons WHERE day = ? AND start = ? AND resource = ? AND until IS NULL", slot)
+            student = _find_student(app, row[0]) if row else None
+            if student: self._write_counts(student)
+        elif kind in ("set_status", "add_makeup", "delete_makeup"):
+            week = app["weeks"][op["week"]]
+            app.get("_dirty_weeks", set()).discard(op["week"])  # Satır burada yazılıyor
+            start_t = datetime.strptime(op["start"], '%H:%M:%S').time()
+            makeup = _find_makeup(week, op["day"], start_t, resource)
+            if kind == "delete_makeup":
+                self.conn.execute("DELETE FROM week_overrides WHERE week = ? AND resource = ? AND day = ? AND start = ? AND makeup = 1", (op["week"], resource, op["day"], op["start"]))
+                student_id = op.get("student_id")
+            elif makeup:
+                self.conn.execute("INSERT OR REPLACE INTO week_overrides (week, resource, day, start, makeup, end, student_id, status) VALUES (?, ?, ?, ?, 1, ?, ?, ?)",
+                                  (op["week"], resource, op["day"], op["start"], makeup["end"].strftime('%H:%M:%S'), makeup["student_id"], makeup["status"]))
+                student_id = makeup["student_id"]
+            else:
+                override = week["overrides"][override_key(resource, op["day"], op["start"])]
+                self.conn.execute("INSERT OR REPLACE INTO week_overrides (week, resource, day, start, makeup, end, student_id, status) VALUES (?, ?, ?, ?, 0, ?, ?, ?)",
+                                  (op["week"], resource, op["day"], op["start"], override["end"].strftime('%H:%M:%S'), override["student_id"], override["status"]))
+                student_id = override["student_id"]
+            student = _find_student(app, student_id)
+            if student and kind != "add_makeup": self._write_counts(student)
+        elif kind == "update_student":
+            self.conn.execute("UPDATE students SET name = ?, parent_name = ?, parent_phone = ?, dob = ? WHERE id = ?", (op["name"], op["parent_name"], op["parent_phone"], op.get("dob"), op["id"]))
+            if "payment_day" in op:
+                student = _find_student(app, op["id"])
+                self.conn.execute("UPDATE students SET payment_day = ?, next_payment_due_date = ? WHERE id = ?",
+                                  (op["payment_day"], _iso_or_none(student["next_payment_due_date"]), op["id"]))
+        elif kind == "add_student":
+            self.conn.execute("INSERT INTO students (id, name, parent_name, parent_phone, dob, payment_day, done_count, student_absent_count, teacher_absent_count) VALUES (?, ?, ?, ?, ?, ?, 0, 0, 0)",
+                              (op["id"], op["name"], op.get("parent_name", ""), op.get("parent_phone", ""), op.get("dob"), op.get("payment_day", 1)))
+        elif kind in ("add_payment", "delete_payment"):
+            if kind == "add_payment":
+                self.conn.execute("INSERT OR IGNORE INTO payments (student_id, date) VALUES (?, ?)", (op["id"], op["date"]))
+            else:
+                self.conn.execute("DELETE FROM payments WHERE student_id = ? AND date = ?", (op["id"], op["date"]))
+            student = _find_student(app, op["id"])
+            self.conn.execute("UPDATE students SET last_payment_date = ?, next_payment_due_date = ? WHERE id = ?",
+                              (_iso_or_none(student["last_payment_date"]), _iso_or_none(student["next_payment_due_date"]), op["id"]))
+        elif kind == "set_working_hours" and op.get("resource"):
+            self.conn.execute("UPDATE resources SET working_hours_start = ?, working_hours_end = ? WHERE id = ?", (op["start"], op["end"], op["resource"]))
+        elif kind == "set_working_hours":
+            self.conn.executemany("UPDATE settings SET value = ? WHERE key = ?", [(op["start"], "working_hours_start"), (op["end"], "working_hours_end")])
+        elif kind == "add_resource":
+            self.conn.execute("INSERT OR IGNORE INTO resources (id, name) VALUES (?, ?)", (op["id"], op["name"]))
+
+    def _write_counts(self, student: Dict[str, Any]):
+        counts = student.get("lesson_counts") or {}
+        self.conn.execute("UPDATE students SET done_count = ?, student_absent_count = ?, teacher_absent_count = ? WHERE id = ?",
+                          tuple(counts.get(status, 0) for status in COUNTED_STATUSES) + (student["id"],))
+
+    def save(self, app: Dict[str, Any]) -> Dict[str, int]:
+        """Tüm durumu tek bir işlemde tablolara yazar (içe aktarma ve tam kayıt için)."""
+        data = serialize_state(app)
+        changes = self.conn.total_changes
+        with self.conn:
+            for table in ("payments", "lessons", "students", "settings", "resources"):
+                self.conn.execute(f"DELETE FROM {table}")
+            self.conn.executemany("INSERT INTO students (id, name, parent_name, parent_phone, dob, payment_day, next_payment_due_date, last_payment_date, done_count, student_absent_count, teacher_absent_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                  [(s["id"], s["name"], s.get("parent_name", ""), s.get("parent_phone", ""), s.get("dob"), s.get("payment_day", 1), s.get("next_payment_due_date"), s.get("last_payment_date"))
+                                   + tuple((s.get("lesson_counts") or {}).get(status, 0) for status in COUNTED_STATUSES) for s in data["students"]])
+            self.conn.executemany("INSERT INTO payments (student_id, date) VALUES (?, ?)",
+                                  [(s["id"], d) for s in data["students"] for d in s.get("payment_history", [])])
+            self.conn.executemany("INSERT INTO lessons (day, start, end, student_id, student, since, until, resource) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                  [(day, l["start"], l["end"], l.get("student_id"), l.get("student", ""), l.get("since"), l.get("until"), lesson_resource(l))
+                                   for day, lessons in data["schedule"].items() for l in lessons])
+            self.conn.executemany("INSERT INTO resources (id, name, working_hours_start, working_hours_end) VALUES (?, ?, ?, ?)",
+                                  [(r["id"], r["name"], *(r["working_hours"] or (None, None))) for r in data["resources"]])
+            for key, week in app.get("weeks", {}).items():  # Yalnızca bellekteki haftalar; diğerleri olduğu gibi kalır
+                self._write_week(key, week)
+            self.conn.executemany("INSERT INTO settings (key, value) VALUES (?, ?)",
+                                  [("working_hours_start", data["working_hours"][0]), ("working_hours_end", data["working_hours"][1])])
+        return {"saves": 1, "rows_written": self.conn.total_changes - changes}
+
+def _iso_or_none(d):
+    return d.isoformat() if d else None
+
+def migrate_json_to_sqlite(storage: SqliteStorage, json_storage: JsonJournalStorage = None):
+    """Mevcut ritim_data.json (+ günlük, hafta dosyaları) içeriğini, JsonJournalStorage.load'un eski veri düzeltmeleriyle birlikte SQLite'a aktarır."""
+    json_storage = json_storage or JsonJournalStorage()
+    app = json_storage.load()
+    for key in json_storage.week_keys(): app["weeks"][key]
+    storage.save(app)
+
+def branch_files(branch: str) -> Dict[str, str]:
+    """Şubenin dosya yolları: ilk şube ritim_data.*, diğerleri ritim_data_<şube>.* kullanır."""
+    if branch == BRANCHES[0]:
+        suffix = ""
+    else:
+        ascii_name = branch.translate(str.maketrans("çğıöşüÇĞİÖŞÜ", "cgiosuCGIOSU")).lower()
+        suffix = "_" + re.sub(r"[^a-z0-9]+", "-", ascii_name).strip("-")
+    return {"data_file": f"ritim_data{suffix}.json", "journal_file": f"ritim_data{suffix}.journal", "weeks_dir": f"ritim_weeks{suffix}",
+            "snapshot_file": f"ritim_data{suffix}.cache", "db_file": f"ritim_data{suffix}.db"}
+
+def get_storage(branch: str = None):
+    files = branch_files(branch or BRANCHES[0])
+    json_storage = JsonJournalStorage(files["data_file"], files["journal_file"], files["weeks_dir"], files["snapshot_file"])
+    if STORAGE_BACKEND == "sqlite":
+        return SqliteStorage(files["db_file"], json_storage)
+    return json_storage
+
+# ---------- Ortak Durum (Oturumlar Arası) ----------
+# Tüm tarayıcı oturumları aynı süreç içindeki tek bir SharedStore'u okur. Her değişiklik, oturumun
+# son gördüğü sürümle (base_version) birlikte gönderilir: aradaki sürümlerde aynı kayda başka bir
+# oturum dokunduysa işlem reddedilir, dokunmadıysa güncel durum üzerinde yeniden doğrulanıp uygulanır.
+# Okumalar kilitsizdir; yalnızca okurken app'e yazan tembel adımlar (hafta yükleme, indeks ve önbellek
+# kurma) store.lock'u, yani state_lock(app)'i alır. Arayüz çizimi ve CSV ayrıştırma kilit dışında kalır.
+class ConflictError(ValueError):
+    pass
+
+def state_lock(app: Dict[str, Any]) -> threading.RLock:
+    """app'in kilidi: SharedStore işlemleri ve app'e yazan tembel okumalar bunu paylaşır."""
+    return app.setdefault("_lock", threading.RLock())
+
+def op_keys(op: Dict[str, Any]) -> List[tuple]:
+    """İşlemin dokunduğu kayıtlar; eşzamanlılık kontrolü bu anahtarlar üzerinden yapılır."""
+    kind = op["op"]
+    resource = op.get("resource") or DEFAULT_RESOURCE
+    if kind in ("add_lesson", "delete_lesson"): return [("lesson", resource, op["day"], op["start"])]
+    if kind in ("set_status", "add_makeup", "delete_makeup"):  # Şablon anahtarı da: arada silinip yeniden eklenen ders yakalanır
+        return [("lesson", op["week"], resource, op["day"], op["start"]), ("lesson", resource, op["day"], op["start"])]
+    if kind in ("add_student", "update_student"): return [("student", op["id"])]
+    if kind in ("add_payment", "delete_payment"): return [("payment", op["id"], op["date"])]
+    if kind == "add_resource": return [("resource", op["id"])]
+    if kind == "set_working_hours": return [(kind, op.get("resource"))]
+    return [(kind,)]
+
+def validate_op(app: Dict[str, Any], op: Dict[str, Any]):
+    """İşlem güncel durumda geçerli değilse ValueError fırlatır."""
+    kind = op["op"]
+    resource = op.get("resource") or DEFAULT_RESOURCE
+    if kind in ("add_lesson", "add_makeup", "delete_lesson", "set_status", "delete_makeup", "set_working_hours") and find_resource(app, resource) is None:
+        raise ValueError("Kaynak bulunamadı.")
+    if kind == "add_lesson":
+        start_t = datetime.strptime(op["start"], '%H:%M:%S').time()
+        end_t = datetime.strptime(op["end"], '%H:%M:%S').time()
+        if op["day"] not in DAYS: raise ValueError(f"Geçersiz gün: {op['day']}")
+        if start_t >= end_t: raise ValueError("Başlangıç, bitişten önce olmalı.")
+        wh_start, wh_end = resource_hours(app, resource)
+        if start_t < wh_start or end_t > wh_end: raise ValueError("Ders mesai saatleri dışında.")
+        if day_intervals(app, op["day"], resource).overlaps(to_minutes(start_t), to_minutes(end_t)): raise ValueError("Bu zaman aralığında çakışma var.")
+        if _find_student(app, op["student_id"]) is None: raise ValueError("Öğrenci bulunamadı.")
+        if student_intervals(app, op["day"], op["student_id"]).overlaps(to_minutes(start_t), to_minutes(end_t)): raise ValueError("Öğrencinin bu saatte başka bir dersi var.")
+        if ended_lesson_conflict(app, op["day"], resource, op["student_id"], to_minutes(start_t), to_minutes(end_t), op.get("since")):
+            raise ValueError("Bu saatte, seçilen haftadan sonra sona eren bir ders var.")
+    elif kind == "add_makeup":
+        start_t = datetime.strptime(op["start"], '%H:%M:%S').time()
+        end_t = datetime.strptime(op["end"], '%H:%M:%S').time()
+        if op["day"] not in DAYS: raise ValueError(f"Geçersiz gün: {op['day']}")
+        if start_t >= end_t: raise ValueError("Başlangıç, bitişten önce olmalı.")
+        wh_start, wh_end = resource_hours(app, resource)
+        if start_t < wh_start or end_t > wh_end: raise ValueError("Ders mesai saatleri dışında.")
+        active = [ev for ev in materialized_week(app, op["week"])[op["day"]] if ev["status"] != "İptal"]
+        if DayIntervals([ev for ev in active if ev["resource"] == resource]).overlaps(to_minutes(start_t), to_minutes(end_t)): raise ValueError("Bu zaman aralığında çakışma var.")
+        if _find_student(app, op["student_id"]) is None: raise ValueError("Öğrenci bulunamadı.")
+        if DayIntervals([ev for ev in active if ev["student_id"] == op["student_id"]]).overlaps(to_minutes(start_t), to_minutes(end_t)):
+            raise ValueError("Öğrencinin bu saatte başka bir dersi var.")
+    elif kind == "delete_lesson":
+        start_t = datetime.strptime(op["start"], '%H:%M:%S').time()
+        if day_intervals(app, op["day"], resource).find(to_minutes(start_t)) is None: raise ValueError("Ders bulunamadı.")
+    elif kind in ("set_status", "delete_makeup"):
+        lesson = week_lesson(app, op["week"], op["day"], datetime.strptime(op["start"], '%H:%M:%S').time(), resource)
+        if lesson is None or (kind == "delete_makeup" and not lesson["makeup"]): raise ValueError("Ders bulunamadı.")
+    elif kind in ("update_student", "add_payment", "delete_payment"):
+        student = _find_student(app, op["id"])
+        if student is None: raise ValueError("Öğrenci bulunamadı.")
+        if kind == "delete_payment" and datetime.fromisoformat(op["date"]).date() not in payment_history(student):
+            raise ValueError("Ödeme kaydı bulunamadı.")
+    elif kind == "add_student":
+        if _find_student(app, op["id"]) is not None: raise ValueError("Bu id ile bir öğrenci zaten var.")
+        if not op["name"].strip(): raise ValueError("Öğrenci adı boş olamaz.")
+    elif kind == "set_working_hours":
+        if op["start"] >= op["end"]: raise ValueError("Başlangıç, bitişten önce olmalı.")
+    elif kind == "add_resource":
+        if find_resource(app, op["id"]) is not None: raise ValueError("Bu id ile bir kaynak zaten var.")
+        if not op["name"].strip(): raise ValueError("Kaynak adı boş olamaz.")
+
+class SharedStore:
+    def __init__(self, storage):
+        self.storage = storage
+        self.app = storage.load()
+        self.lock = state_lock(self.app)
+        self.version = 0
+        self.changed_at: Dict[tuple, int] = {}  # kayıt anahtarı -> son değiştiği sürüm
+
+    def commit(self, op: Dict[str, Any], base_version: int) -> tuple:
+        """Karşılaştır-ve-uygula: (yeni sürüm, bu işlemin yazmaları) döndürür, çakışmada ConflictError fırlatır."""
+        with self.lock:
+            keys = op_keys(op)
+            if any(self.changed_at.get(k, 0) > base_version for k in keys):
+                raise ConflictError("Bu kayıt başka bir oturumda değiştirildi. Güncel veriyi görmek için sayfayı yenileyip tekrar deneyin.")
+            validate_op(self.app, op)
+            apply_op(self.app, op)
+            written = self.storage.commit(self.app, op)
+            self.version += 1
+            for k in keys: self.changed_at[k] = self.version
+            return self.version, written
+
+    def commit_batch(self, ops: List[Dict[str, Any]], base_version: int, allow_duplicate_names: bool = False) -> tuple:
+        """İşlemleri tek sürüm olarak uygular: hepsi birlikte doğrulanır, tek seferde kalıcı hale getirilir. Dönüş commit gibidir."""
+        with self.lock:
+            keys = [k for op in ops for k in op_keys(op)]
+            if any(self.changed_at.get(k, 0) > base_version for k in keys):
+                raise ConflictError("Bu kayıt başka bir oturumda değiştirildi. Güncel veriyi görmek için sayfayı yenileyip tekrar deneyin.")
+            validator = BatchValidator(self.app, allow_duplicate_names)
+            for i, op in enumerate(ops):
+                try: validator.check(op)
+                except ValueError as e: raise ValueError(f"{i + 1}. kayıt: {e}")
+            for op in ops: apply_op(self.app, op)
+            written = self.storage.commit_batch(self.app, ops)
+            self.version += 1
+            for k in keys: self.changed_at[k] = self.version
+            return self.version, written
+
+    def save(self) -> Dict[str, int]:
+        with self.lock:
+            return self.storage.save(self.app)
+
+# ---------- Yardımcılar ----------
+def to_dt(t: time) -> datetime: return datetime.combine(date.today(), t)
+def hhmm(t: time) -> str: return t.strftime("%H:%M")
+def to_minutes(t: time) -> int: return t.hour * 60 + t.minute
+def from_minutes(m: int) -> time: return time(m // 60, m % 60)
+
+class DayIntervals:
+    """Bir günün dersleri için başlangıca göre sıralı dakika aralıkları (dersler çakışmaz)."""
+    def __init__(self, lessons: List[Dict[str, Any]]):
+        ordered = sorted(lessons, key=lambda e: e["start"])
+        self.lessons = ordered
+        self.starts = [to_minutes(e["start"]) for e in ordered]
+        self.ends = [to_minutes(e["end"]) for e in ordered]
+
+    def overlaps(self, start_m: int, end_m: int) -> bool:
+        i = bisect_right(self.starts, start_m)
+        if i > 0 and self.ends[i - 1] > start_m: return True
+        return i < len(self.starts) and self.starts[i] < end_m
+
+    def add(self, lesson: Dict[str, Any]):
+        """Çakışmadığı doğrulanmış bir dersi sıralamayı bozmadan ekler."""
+        i = bisect_right(self.starts, to_minutes(lesson["start"]))
+        self.lessons.insert(i, lesson)
+        self.starts.insert(i, to_minutes(lesson["start"]))
+        self.ends.insert(i, to_minutes(lesson["end"]))
+
+    def find(self, start_m: int):
+        i = bisect_left(self.starts, start_m)
+        if i < len(self.starts) and self.starts[i] == start_m: return self.lessons[i]
+        return None
+
+    def free_windows(self, wh_start_m: int, wh_end_m: int, min_minutes: int) -> List[tuple]:
+        windows, cursor = [], wh_start_m
+        for s, e in zip(self.starts, self.ends):
+            if min(s, wh_end_m) - cursor >= min_minutes: windows.append((cursor, min(s, wh_end_m)))
+            cursor = max(cursor, e)
+        if wh_end_m - cursor >= min_minutes: windows.append((cursor, wh_end_m))
+        return windows
+
+def schedule_version_key(app: Dict[str, Any]) -> tuple:
+    return tuple(app.get("_day_versions", {}).get(d, 0) for d in DAYS)
+
+def memoized(app: Dict[str, Any], name: str, key, compute):
+    """compute() sonucunu app[name] altında key ile saklar; key değişmedikçe yeniden hesaplamaz."""
+    cached = app.get(name)
+    if cached and cached[0] == key: return cached[1]
+    value = compute()
+    app[name] = (key, value)
+    return value
+
+def _slot_intervals(app: Dict[str, Any], by: str, day: str, value) -> DayIntervals:
+    """Süren şablonların (gün, kaynak|öğrenci) aralık indeksi; yalnızca o ikilinin sürümü değişince yeniden kurulur."""
+    version = slot_version(app, by, day, value)
+    cached = app.get(f"_{by}_intervals", {}).get((day, value))
+    if cached is None or cached[0] != version:
+        with state_lock(app):
+            active = [l for l in template_index(app, by).get((day, value), []) if not l.get("until")]
+            cached = app.setdefault(f"_{by}_intervals", {})[(day, value)] = (slot_version(app, by, day, value), DayIntervals(active))
+    return cached[1]
+
+def day_intervals(app: Dict[str, Any], day: str, resource: str = DEFAULT_RESOURCE) -> DayIntervals:
+    """Bir kaynağın o günkü aralık indeksi; ders listesi değişmediyse önbellekteki indeks kullanılır."""
+    return _slot_intervals(app, "resource", day, resource)
+
+def student_intervals(app: Dict[str, Any], day: str, student_id) -> DayIntervals:
+    """Öğrencinin o günkü dersleri (tüm kaynaklarda) için aralık indeksi."""
+    return _slot_intervals(app, "student", day, student_id)
+
+def resource_version_key(app: Dict[str, Any], resource: str = None) -> tuple:
+    """Kaynağın şablon sürümleri; resource None ise tüm program (schedule_version_key)."""
+    if resource is None: return schedule_version_key(app)
+    return tuple(slot_version(app, "resource", d, resource) for d in DAYS)
+
+def week_overrides_by_resource(app: Dict[str, Any], key: str) -> Dict[str, Dict[str, Any]]:
+    """Haftanın değişiklik kayıtları kaynağa göre (kaynak -> {anahtar: kayıt}); hafta değişince yeniden kurulur."""
+    with state_lock(app):
+        version = app.get("_week_versions", {}).get(key, 0)
+        cache = app.setdefault("_overrides_cache", {})
+        cached = cache.get(key)
+        if cached is None or cached[0] != version:
+            groups: Dict[str, Dict[str, Any]] = {}
+            for slot, override in app["weeks"][key]["overrides"].items(): groups.setdefault(parse_override_key(slot)[0], {})[slot] = override
+            cached = cache[key] = (version, groups)
+        return cached[1]
+
+def compute_week(app: Dict[str, Any], key: str, resource: str = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Bir ISO haftasının derslerini şablonlardan ve o haftanın değişikliklerinden üretir (gün -> sıralı dersler).
+    resource verilirse yalnızca o kaynağın dersleri üretilir."""
+    week = app["weeks"][key]
+    monday = week_monday(key)
+    result = {day: [] for day in DAYS}
+    seen = set()
+    by_resource = template_index(app, "resource") if resource is not None else None
+    for i, day in enumerate(DAYS):
+        lesson_date = monday + timedelta(days=i)
+        for template in app["schedule"].get(day, []) if resource is None else by_resource.get((day, resource), []):
+            template_resource = lesson_resource(template)
+            if not template_active(template, key): continue
+            slot = override_key(template_resource, day, template['start'].strftime('%H:%M:%S'))
+            override = week["overrides"].get(slot)
+            seen.add(slot)
+            result[day].append({"day": day, "date": lesson_date, "start": template["start"], "end": template["end"], "student_id": template["student_id"],
+                                "status": override["status"] if override else "Planlandı", "makeup": False, "resource": template_resource})
+    overrides = week["overrides"] if resource is None else week_overrides_by_resource(app, key).get(resource, {})
+    for slot, override in overrides.items():
+        if slot in seen: continue
+        # Şablonu sonradan silinmiş dersin geçmiş kaydı
+        slot_resource, day, start = parse_override_key(slot)
+        if day not in result: continue
+        result[day].append({"day": day, "date": monday + timedelta(days=DAYS.index(day)), "start": datetime.strptime(start, '%H:%M:%S').time(), "end": override["end"],
+                            "student_id": override["student_id"], "status": override["status"], "makeup": False, "resource": slot_resource})
+    for makeup in week["makeups"]:
+        if makeup["day"] in result and resource in (None, lesson_resource(makeup)):
+            result[makeup["day"]].append({**makeup, "date": monday + timedelta(days=DAYS.index(makeup["day"])), "makeup": True, "resource": lesson_resource(makeup)})
+    for instances in result.values(): instances.sort(key=lambda e: e["start"])
+    return result
+
+def materialized_week(app: Dict[str, Any], key: str, resource: str = None) -> Dict[str, List[Dict[str, Any]]]:
+    """compute_week sonucunu son WEEK_CACHE_SIZE hafta için, haftada kaynak başına saklar (LRU); şablon ya da hafta değişince yenilenir.
+    Üretim, haftanın değişiklik kayıtlarını dolaştığından eşzamanlı bir işlemle yarışmasın diye kilit altında yapılır."""
+    with state_lock(app):
+        version = (resource_version_key(app, resource), app.get("_week_versions", {}).get(key if resource is None else (key, resource), 0))
+        lru = app.setdefault("_week_lru", OrderedDict())
+        views = lru.setdefault(key, {})
+        cached = views.get(resource)
+        if cached is None or cached[0] != version:
+            cached = views[resource] = (version, compute_week(app, key, resource))
+        lru.move_to_end(key)
+        while len(lru) > WEEK_CACHE_SIZE: lru.popitem(last=False)
+        if len(app["weeks"]) > WEEK_CACHE_SIZE: _evict_weeks(app, lru)
+        return cached[1]
+
+def _evict_weeks(app: Dict[str, Any], keep):
+    """keep dışındaki, kaydedilmemiş değişikliği olmayan haftaları bellekten çıkarır; gerekince depolamadan yeniden okunurlar."""
+    dirty = app.get("_dirty_weeks", ())
+    for key in [k for k in app["weeks"] if k not in keep and k not in dirty]:
+        del app["weeks"][key]
+        app.get("_overrides_cache", {}).pop(key, None)
+
+def week_lesson(app: Dict[str, Any], key: str, day: str, start_t: time, resource: str = DEFAULT_RESOURCE):
+    if day not in DAYS: return None
+    return next((ev for ev in materialized_week(app, key, resource)[day] if ev["start"] == start_t), None)
+
+def check_conflict(app: Dict[str, Any], day: str, start_t: time, end_t: time, resource: str = DEFAULT_RESOURCE, student_id=None) -> bool:
+    """Kaynakta ya da (verilirse) öğrencinin başka bir dersinde çakışma var mı."""
+    start_m, end_m = to_minutes(start_t), to_minutes(end_t)
+    if day_intervals(app, day, resource).overlaps(start_m, end_m): return True
+    return student_id is not None and student_intervals(app, day, student_id).overlaps(start_m, end_m)
+
+def free_slots(app: Dict[str, Any], dur_minutes: int, resource: str = DEFAULT_RESOURCE, week: str = None) -> List[tuple]:
+    """Kaynağın mesai saatleri içinde, hafta boyunca en az dur_minutes uzunluğundaki boş pencereler: (gün, başlangıç, bitiş).
+    week verilirse, o haftadan sonra sona eren şablonlar da dolu sayılır (validate_op'taki ended_lesson_conflict gibi)."""
+    wh_start, wh_end = resource_hours(app, resource)
+    result = []
+    for day in DAYS:
+        intervals = day_intervals(app, day, resource)
+        ending = [l for l in template_index(app, "resource").get((day, resource), []) if l.get("until") and l["until"] > week] if week else []
+        if ending: intervals = DayIntervals(intervals.lessons + ending)
+        for s, e in intervals.free_windows(to_minutes(wh_start), to_minutes(wh_end), dur_minutes):
+            result.append((day, from_minutes(s), from_minutes(e)))
+    return result
+
+def duration_to_slots(start_t: time, end_t: time) -> int:
+    mins = int((to_dt(end_t) - to_dt(start_t)).total_seconds() // 60)
+    return max(1, mins // 30)
+
+def calculate_statistics(app: Dict[str, Any], resource: str = None) -> Dict[str, float]:
+    """Doluluk; resource verilmezse tüm kaynakların toplamı (her kaynak kendi mesai saatiyle)."""
+    resources = [r["id"] for r in app["resources"]] if resource is None else [resource]
+    total_available_minutes = 0
+    for res in resources:
+        wh_start, wh_end = resource_hours(app, res)
+        total_available_minutes += (to_dt(wh_end) - to_dt(wh_start)).total_seconds() / 60 * len(DAYS)
+    total_filled_minutes = 0
+    index = template_index(app, "resource")
+    for day in DAYS:
+        for lesson in (l for res in resources for l in index.get((day, res), [])):
+            if lesson.get("until"): continue
+            lesson_duration = (to_dt(lesson["end"]) - to_dt(lesson["start"])).total_seconds() / 60
+            total_filled_minutes += lesson_duration
+    total_empty_minutes = total_available_minutes - total_filled_minutes
+    occupancy_rate = (total_filled_minutes / total_available_minutes) * 100 if total_available_minutes > 0 else 0
+    return {"filled_hours": total_filled_minutes / 60, "empty_hours": total_empty_minutes / 60, "occupancy_rate": occupancy_rate}
+
+# ---------- Ödeme Motoru ----------
+# Tüm öğrencilerin vade ve gecikme bilgisi tek geçişte hesaplanır ve bir ödeme değişene
+# (ya da gün dönene) kadar saklanır; paneller ve yaşlandırma raporu aynı sonucu okur.
+AGING_BUCKETS = ["Güncel", "1–30 gün", "31–60 gün", "60+ gün", "Plan yok"]
+def aging_bucket(due: date, today: date) -> str:
+    if due is None: return "Plan yok"
+    overdue_days = (today - due).days
+    if overdue_days <= 0: return "Güncel"
+    if overdue_days <= 30: return "1–30 gün"
+    if overdue_days <= 60: return "31–60 gün"
+    return "60+ gün"
+
+def compute_payment_status(app: Dict[str, Any], today: date) -> Dict[int, Dict[str, Any]]:
+    """Öğrenci id -> {"due", "overdue_days", "bucket"}; vade son ödemeden next_due_date ile hesaplanır."""
+    status = {}
+    for student in app["students"]:
+        last_payment = student.get("last_payment_date")
+        due = next_due_date(last_payment, student.get("payment_day", 1)) if last_payment else student.get("next_payment_due_date")
+        status[student["id"]] = {"due": due, "overdue_days": max(0, (today - due).days) if due else 0, "bucket": aging_bucket(due, today)}
+    return status
+
+def payment_status(app: Dict[str, Any]) -> Dict[int, Dict[str, Any]]:
+    today = date.today()
+    with state_lock(app):
+        return memoized(app, "_payment_cache", (app.get("_payments_version", 0), len(app["students"]), today), lambda: compute_payment_status(app, today))
+
+def aging_report(app: Dict[str, Any]) -> tuple:
+    """(kova -> öğrenci sayısı, gecikmedeki öğrenciler en eski borçtan başlayarak)."""
+    status = payment_status(app)
+    counts = {bucket: 0 for bucket in AGING_BUCKETS}
+    debtors = []
+    for student in app["students"]:
+        info = status[student["id"]]
+        counts[info["bucket"]] += 1
+        if info["overdue_days"] > 0:
+            debtors.append({"Öğrenci": student["name"], "Veli Telefonu": student.get("parent_phone", ""), "Vade": info["due"],
+                            "Gecikme (gün)": info["overdue_days"], "Kova": info["bucket"]})
+    debtors.sort(key=lambda row: row["Gecikme (gün)"], reverse=True)
+    return counts, debtors
+
+# ---------- Tablo Render ----------
+# Seçili haftanın her (kaynak, gün) sütunu bir kez üretilip (hafta, gün sürümü, hafta sürümü, öğrenci adları
+# sürümü, mesai saatleri) anahtarıyla saklanır; kaynak tablosu da bunlar değişmedikçe yeniden kurulmaz.
+# Bir düzenleme yalnızca o günün sütunlarını yeniler; yalnızca ekranda gösterilen kaynaklar üretilir.
+# Bu önbellek ortak durumda değil, çağıranın verdiği sözlükte (oturum başına) tutulur.
+STATUS_CLASSES = {"Planlandı": "cell-occupied", "Yapıldı": "cell-done", "Yapılmadı-Öğrenci": "cell-student-absent", "Yapılmadı-Eğitmen": "cell-teacher-absent", "İptal": "cell-cancelled"}
+def render_day_column(app: Dict[str, Any], day: str, week: str, resource: str = DEFAULT_RESOURCE, cache: Dict[str, Any] = None, branch: str = None) -> List[Any]:
+    """TIME_SLOTS ile hizalı hücre listesi; None, üstteki dersin rowspan'i altında kalan hücredir.
+    Ders bağlantısı yeni bir oturum açtığından şube (verilirse) bağlantıya yazılır."""
+    wh_start, wh_end = resource_hours(app, resource)
+    key = (week, slot_version(app, "resource", day, resource), app.get("_week_versions", {}).get((week, resource), 0), app.get("_names_version", 0), wh_start, wh_end)
+    cache = {} if cache is None else cache.setdefault("columns", {})
+    cached = cache.get((resource, day))
+    if cached and cached[0] == key: return cached[1]
+    by_start = {ev["start"]: ev for ev in materialized_week(app, week, resource)[day]}
+    resource_param = "" if resource == DEFAULT_RESOURCE else f"&resource={resource}"
+    if branch: resource_param += f"&branch={quote(branch)}"
+    cells: List[Any] = []
+    covered_until = -1
+    for row_idx, slot_start in enumerate(TIME_SLOTS):
+        if row_idx <= covered_until:
+            cells.append(None); continue
+        ev = by_start.get(slot_start)
+        if ev:
+            span = duration_to_slots(ev["start"], ev["end"])
+            covered_until = row_idx + span - 1
+            status = ev.get("status", "Planlandı")
+            cls = STATUS_CLASSES.get(status, "cell-occupied")
+            link_href = f"?action=edit_lesson&week={week}&day={day}&start={ev['start'].strftime('%H:%M:%S')}{resource_param}"
+            label = f"{status} · telafi" if ev["makeup"] else status
+            cell_content = (f"<a href='{link_href}' target='_self' class='lesson-link'><div class='cell-text'><b>{lesson_student_name(app, ev)}</b><br><small>{hhmm(ev['start'])}–{hhmm(ev['end'])}</small><br><small><i>{label}</i></small></div></a>")
+            cells.append(f'<td class="{cls}" rowspan="{span}">{cell_content}</td>')
+        elif slot_start < wh_start or slot_start >= wh_end:
+            cells.append('<td style="background:rgba(0,0,0,0.3);"></td>')
+        else:
+            cells.append('<td></td>')
+    cache[(resource, day)] = (key, cells)
+    return cells
+
+def render_table_html(app: Dict[str, Any], week: str, resource: str = DEFAULT_RESOURCE, cache: Dict[str, Any] = None, branch: str = None) -> str:
+    """Kaynağın hafta tablosu; cache verilirse tablo ve gün sütunları orada saklanır (önbellek şube başına ayrı olmalı)."""
+    key = (week, resource_version_key(app, resource), app.get("_week_versions", {}).get((week, resource), 0), app.get("_names_version", 0), resource_hours(app, resource))
+    if cache is None: return _build_table_html(app, week, resource, None, branch)
+    return memoized(cache.setdefault("tables", {}), resource, key, lambda: _build_table_html(app, week, resource, cache, branch))
+
+def _build_table_html(app: Dict[str, Any], week: str, resource: str, cache: Dict[str, Any], branch: str) -> str:
+    columns = [render_day_column(app, d, week, resource, cache, branch) for d in DAYS]
+    monday = week_monday(week)
+    html = ['<table class="schedule-table">']
+    html.append("<thead><tr><th class='time-col'>Saat</th>")
+    for i, d in enumerate(DAYS): html.append(f"<th>{d}<br><small>{(monday + timedelta(days=i)).strftime('%d.%m')}</small></th>")
+    html.append("</tr></thead><tbody>")
+    for row_idx, slot_start in enumerate(TIME_SLOTS):
+        if slot_start == time(22, 0): continue
+        row_html = [f'<td class="time-col">{hhmm(slot_start)}</td>']
+        row_html.extend(col[row_idx] for col in columns if col[row_idx] is not None)
+        html.append("<tr>" + "".join(row_html) + "</tr>")
+    html.append("</tbody></table>")
+    return "\n".join(html)
+
+# ---------- Özetler ----------
+def student_fault_summary(app: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Yapılmayan dersi olan öğrenciler, en çok telafi borcu olandan başlayarak (öğrenci sayaçlarından, O(öğrenci))."""
+    summary = []
+    for s_obj in app["students"]:
+        counts = s_obj.get("lesson_counts") or {}
+        student_fault = counts.get("Yapılmadı-Öğrenci", 0)
+        teacher_fault = counts.get("Yapılmadı-Eğitmen", 0)
+        if student_fault + teacher_fault > 0:
+            summary.append({"Öğrenci": s_obj['name'], "Telafi": student_fault + teacher_fault, "Öğrenci Kaynaklı": student_fault,
+                            "Eğitmen Kaynaklı": teacher_fault, "Yapıldı": counts.get("Yapıldı", 0)})
+    summary.sort(key=lambda row: row["Telafi"], reverse=True)
+    return summary
+
+# ---------- Toplu İçe/Dışa Aktarma ----------
+# CSV satırları akış halinde okunur, her satır işleme çevrilip BatchValidator ile hem mevcut veriye hem
+# de dosyada daha önce kabul edilen satırlara karşı doğrulanır. Hata yoksa işlemler SharedStore.commit_batch
+# ile tek günlük yazımı / tek SQLite işlemi olarak kaydedilir.
+CSV_COLUMNS = {
+    "students": ["id", "name", "parent_name", "parent_phone", "dob", "payment_day"],
+    "schedule": ["day", "start", "end", "student_id", "student", "since", "resource"],
+    "payments": ["student_id", "student", "date"],
+}
+CSV_REQUIRED = {"students": ["name"], "schedule": ["day", "start", "end"], "payments": ["date"]}  # Öğrenci, id ya da adla (student) verilebilir
+
+class BatchValidator:
+    """validate_op'un toplu hali: kabul edilen işlemler sonraki satırların kontrolüne dahil edilir."""
+    def __init__(self, app: Dict[str, Any], allow_duplicate_names: bool = False):
+        self.app = app
+        self.allow_duplicate_names = allow_duplicate_names  # Kapalıyken mevcut ya da dosyada önceki bir adla öğrenci eklenemez
+        self.names = None
+        self.intervals: Dict[tuple, DayIntervals] = {}  # (kaynak, gün) ve ("öğrenci", id, gün) -> dosyada kabul edilen dersler
+        self.new_students: Dict[int, str] = {}
+        self.payments = set()
+
+    def student_exists(self, student_id) -> bool:
+        return student_id in self.new_students or _find_student(self.app, student_id) is not None
+
+    def check(self, op: Dict[str, Any]):
+        """İşlem geçersizse ValueError fırlatır, geçerliyse sonraki kontroller için kaydeder."""
+        kind = op["op"]
+        if kind == "add_student":
+            if self.student_exists(op["id"]): raise ValueError("Bu id ile bir öğrenci zaten var.")
+            if not op["name"].strip(): raise ValueError("Öğrenci adı boş olamaz.")
+            if not self.allow_duplicate_names:
+                if self.names is None: self.names = {s["name"] for s in self.app["students"]}
+                if op["name"] in self.names: raise ValueError(f"Bu adla bir öğrenci zaten var: {op['name']}")
+                self.names.add(op["name"])
+            self.new_students[op["id"]] = op["name"]
+        elif kind == "add_lesson":
+            start_t = datetime.strptime(op["start"], '%H:%M:%S').time()
+            end_t = datetime.strptime(op["end"], '%H:%M:%S').time()
+            resource = op.get("resource") or DEFAULT_RESOURCE
+            start_m, end_m = to_minutes(start_t), to_minutes(end_t)
+            if op["day"] not in DAYS: raise ValueError(f"Geçersiz gün: {op['day']}")
+            if find_resource(self.app, resource) is None: raise ValueError(f"Kaynak bulunamadı: {resource}")
+            if start_t >= end_t: raise ValueError("Başlangıç, bitişten önce olmalı.")
+            wh_start, wh_end = resource_hours(self.app, resource)
+            if start_t < wh_start or end_t > wh_end: raise ValueError("Ders mesai saatleri dışında.")
+            if not self.student_exists(op["student_id"]): raise ValueError("Öğrenci bulunamadı.")
+            if day_intervals(self.app, op["day"], resource).overlaps(start_m, end_m): raise ValueError("Bu zaman aralığında çakışma var.")
+            if student_intervals(self.app, op["day"], op["student_id"]).overlaps(start_m, end_m): raise ValueError("Öğrencinin bu saatte başka bir dersi var.")
+            if ended_lesson_conflict(self.app, op["day"], resource, op["student_id"], start_m, end_m, op.get("since")):
+                raise ValueError("Bu saatte, seçilen haftadan sonra sona eren bir ders var.")
+            staged = self.intervals.setdefault((resource, op["day"]), DayIntervals([]))
+            staged_student = self.intervals.setdefault(("öğrenci", op["student_id"], op["day"]), DayIntervals([]))
+            if staged.overlaps(start_m, end_m) or staged_student.overlaps(start_m, end_m): raise ValueError("Dosyadaki başka bir dersle çakışıyor.")
+            staged.add({"start": start_t, "end": end_t})
+            staged_student.add({"start": start_t, "end": end_t})
+        elif kind == "add_payment":
+            if not self.student_exists(op["id"]): raise ValueError("Öğrenci bulunamadı.")
+            payment_date = datetime.fromisoformat(op["date"]).date()
+            if payment_date > date.today(): raise ValueError("Gelecek tarihli ödeme kaydedilemez.")
+            student = _find_student(self.app, op["id"])
+            if (op["id"], payment_date) in self.payments or (student and payment_date in payment_history(student)):
+                raise ValueError("Bu tarihte zaten bir ödeme kaydı var.")
+            self.payments.add((op["id"], payment_date))
+        else:
+            validate_op(self.app, op)
+
+def _parse_time(value: str) -> str:
+    return datetime.strptime(value, '%H:%M:%S' if value.count(":") == 2 else '%H:%M').strftime('%H:%M:%S')
+
+def _row_student_id(app: Dict[str, Any], row: Dict[str, str], names: Dict[str, int]):
+    if (row.get("student_id") or "").strip(): return int(row["student_id"])
+    name = (row.get("student") or "").strip()
+    if name not in names: raise ValueError(f"Öğrenci bulunamadı: {name or '(boş)'}")
+    return names[name]
+
+def _row_op(app: Dict[str, Any], kind: str, row: Dict[str, str], names: Dict[str, int], next_id: List[int]) -> Dict[str, Any]:
+    """CSV satırını işleme çevirir; biçim hatalarında ValueError fırlatır."""
+    if kind == "students":
+        dob = (row.get("dob") or "").strip()
+        if dob: date.fromisoformat(dob)
+        op = {"name": (row.get("name") or "").strip(), "parent_name": (row.get("parent_name") or "").strip(),
+              "parent_phone": (row.get("parent_phone") or "").strip(), "dob": dob or None}
+        if (row.get("payment_day") or "").strip():
+            op["payment_day"] = int(row["payment_day"])
+            if not 1 <= op["payment_day"] <= 31: raise ValueError("Ödeme günü 1-31 arasında olmalı.")
+        student_id = int(row["id"]) if (row.get("id") or "").strip() else None
+        existing = _find_student(app, student_id) if student_id is not None else None
+        if existing is not None:  # Boş bırakılan alanlar mevcut değeri korur
+            for key in ("name", "parent_name", "parent_phone"): op[key] = op[key] or existing.get(key, "")
+            op["dob"] = op["dob"] or _iso_or_none(existing.get("dob"))
+            return {"op": "update_student", "id": student_id, **op}
+        if student_id is None:
+            student_id = next_id[0]
+        next_id[0] = max(next_id[0], student_id + 1)
+        names.setdefault(op["name"], student_id)
+        return {"op": "add_student", "id": student_id, **op}
+    if kind == "schedule":
+        since = (row.get("since") or "").strip() or week_key(date.today())
+        week_monday(since)
+        op = {"op": "add_lesson", "day": (row.get("day") or "").strip(), "start": _parse_time(row["start"].strip()), "end": _parse_time(row["end"].strip()),
+              "student_id": _row_student_id(app, row, names), "since": since}
+        resource = (row.get("resource") or "").strip()
+        if resource and resource != DEFAULT_RESOURCE: op["resource"] = resource
+        return op
+    if kind == "payments":
+        return {"op": "add_payment", "id": _row_student_id(app, row, names), "date": date.fromisoformat(row["date"].strip()).isoformat()}
+    raise ValueError(f"Bilinmeyen içe aktarma türü: {kind}")
+
+def plan_import(app: Dict[str, Any], kind: str, lines: Iterable[str], allow_duplicate_names: bool = False) -> tuple:
+    """CSV satırlarını tek geçişte işlemlere çevirip doğrular: (işlemler, "N. satır: hata" listesi)."""
+    reader = csv.DictReader(lines)
+    missing = [c for c in CSV_REQUIRED[kind] if c not in (reader.fieldnames or [])]
+    if missing: return [], [f"Eksik sütunlar: {', '.join(missing)}"]
+    names: Dict[str, int] = {}
+    for student in app["students"]: names.setdefault(student["name"], student["id"])
+    next_id = [max((s["id"] for s in app["students"]), default=0) + 1]
+    validator = BatchValidator(app, allow_duplicate_names)
+    ops, errors = [], []
+    for row in reader:
+        try:
+            op = _row_op(app, kind, row, names, next_id)
+            validator.check(op)
+            ops.append(op)
+        except (ValueError, KeyError, AttributeError) as e:
+            errors.append(f"{reader.line_num}. satır: {e}")
+    return ops, errors
+
+def _csv_line(values: List[Any]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(["" if v is None else v for v in values])
+    return buffer.getvalue()
+
+def iter_export(app: Dict[str, Any], kind: str) -> Iterator[str]:
+    """CSV_COLUMNS düzeninde satır satır CSV üretir; plan_import ile geri okunabilir."""
+    yield _csv_line(CSV_COLUMNS[kind])
+    if kind == "students":
+        for s in app["students"]:
+            yield _csv_line([s["id"], s["name"], s.get("parent_name", ""), s.get("parent_phone", ""), _iso_or_none(s.get("dob")), s.get("payment_day", 1)])
+    elif kind == "schedule":
+        for day in DAYS:
+            for lesson in app["schedule"].get(day, []):
+                if lesson.get("until"): continue  # Sona ermiş şablonlar programın parçası değil
+                yield _csv_line([day, lesson["start"].strftime('%H:%M:%S'), lesson["end"].strftime('%H:%M:%S'), lesson.get("student_id"),
+                                 lesson_student_name(app, lesson), lesson.get("since"), lesson_resource(lesson)])
+    elif kind == "payments":
+        for s in app["students"]:
+            for d in s.get("payment_history", []):  # Çözülmemiş geçmişler metin olarak yazılır
+                yield _csv_line([s["id"], s["name"], d if isinstance(d, str) else d.isoformat()])
+
+# ---------- Profil ----------
+class RerunProfile:
+    """Bir yeniden çalıştırmanın adlandırılmış aşama süreleri (ms) ve bu çalıştırmanın yaptığı yazmalar.
+
+    Aşamalar iç içe olabilir (ör. bir paneldeki "save"); her aşama kendi toplam süresini tutar.
+    Yazmalar, çalıştırmanın commit'lerinin döndürdüğü sayaçlardan add_io ile toplanır.
+    """
+    def __init__(self, kind: str = None):
+        self.kind = kind
+        self.started = perf_counter()
+        self.io = dict.fromkeys(IO_COUNTERS, 0)
+        self.phases: Dict[str, float] = {}
+        self.finished = False
+
+    @contextmanager
+    def phase(self, name: str):
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + (perf_counter() - started) * 1000
+
+    def finish(self) -> Dict[str, Any]:
+        self.finished = True
+        record = {"at": datetime.now().isoformat(timespec="seconds"), "kind": self.kind, "total_ms": round((perf_counter() - self.started) * 1000, 2),
+                  "phases": {name: round(ms, 2) for name, ms in self.phases.items()}}
+        record.update(self.io)
+        return record
@@ -0,0 +1,15 @@
+"""Testlerin ortak kurulumu: geçici dizinde JSON deposu ve sık kullanılan işlem kayıtları."""
+from datetime import date
+
+from ritim_core import JsonJournalStorage, shift_week, week_key
+
+CURRENT_WEEK = week_key(date.today())
+
+def json_storage(path) -> JsonJournalStorage:
+    return JsonJournalStorage(str(path / "ritim_data.json"), str(path / "ritim_data.journal"), str(path / "ritim_weeks"), str(path / "ritim_data.cache"))
+
+def payment(student_id: int, day: str) -> dict:
+    return {"op": "add_payment", "id": student_id, "date": day}
+
+def lesson(day: str, start: str, end: str, student_id: int, **extra) -> dict:
+    return {"op": "add_lesson", "day": day, "start": start, "end": end, "student_id": student_id, "since": shift_week(CURRENT_WEEK, -4), **extra}
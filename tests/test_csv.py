@@ -0,0 +1,35 @@
+"""CSV içe/dışa aktarma: tekrar içe aktarma yinelenen öğrenci üretmez, program dışa aktarımı geri yüklenebilir."""
+import pytest
+
+from ritim_core import SharedStore, compute_week, iter_export, plan_import
+
+from helpers import CURRENT_WEEK, json_storage, lesson
+
+def test_import_rerun_does_not_duplicate_students(tmp_path):
+    store = SharedStore(json_storage(tmp_path))
+    rows = ["name,parent_name\n", "Yeni Öğrenci,Veli\n", "Diğer Öğrenci,Veli\n"]
+    ops, errors = plan_import(store.app, "students", rows)
+    assert errors == [] and len(ops) == 2
+    store.commit_batch(ops, store.version)
+
+    ops, errors = plan_import(store.app, "students", rows)
+    assert len(errors) == 2 and all("zaten var" in e for e in errors)
+    with pytest.raises(ValueError):
+        store.commit_batch([{"op": "add_student", "id": 99, "name": "Yeni Öğrenci"}], store.version)
+    ops, errors = plan_import(store.app, "students", rows, allow_duplicate_names=True)
+    assert errors == [] and len(ops) == 2
+
+def test_schedule_export_round_trips_into_empty_branch(tmp_path):
+    store = SharedStore(json_storage(tmp_path))
+    store.commit({"op": "add_resource", "id": "k2", "name": "Oda 2"}, store.version)
+    store.commit(lesson("Salı", "10:00:00", "11:00:00", 1), store.version)
+    store.commit(lesson("Salı", "10:00:00", "11:00:00", 2, resource="k2"), store.version)
+    exported = list(iter_export(store.app, "schedule"))
+
+    (tmp_path / "other").mkdir()
+    other = SharedStore(json_storage(tmp_path / "other"))
+    other.commit({"op": "add_resource", "id": "k2", "name": "Oda 2"}, other.version)
+    ops, errors = plan_import(other.app, "schedule", exported)
+    assert errors == []
+    other.commit_batch(ops, other.version)
+    assert compute_week(other.app, CURRENT_WEEK) == compute_week(store.app, CURRENT_WEEK)
@@ -0,0 +1,37 @@
+"""DayIntervals sınırları ve free_slots önerilerinin doğrulamayla tutarlılığı."""
+from datetime import time
+
+import pytest
+
+from ritim_core import DayIntervals, SharedStore, free_slots, shift_week
+
+from helpers import CURRENT_WEEK, json_storage, lesson
+
+def intervals(*spans) -> DayIntervals:
+    return DayIntervals([{"start": time(*start), "end": time(*end)} for start, end in spans])
+
+@pytest.mark.parametrize("start_m, end_m, expected", [
+    (540, 600, False),  # 09:00-10:00, dersin başına değiyor
+    (660, 720, False),  # 11:00-12:00, iki dersin arasını tam dolduruyor
+    (780, 840, False),  # 13:00-14:00, son dersin bitişinden sonra
+    (599, 601, True), (659, 661, True), (610, 620, True), (500, 800, True),
+])
+def test_overlaps_treats_touching_lessons_as_free(start_m, end_m, expected):
+    assert intervals(((10, 0), (11, 0)), ((12, 0), (13, 0))).overlaps(start_m, end_m) is expected
+
+def test_free_windows_respects_working_hours_and_minimum_length():
+    day = intervals(((7, 0), (8, 30)), ((10, 0), (11, 0)), ((12, 0), (13, 0)), ((21, 30), (23, 0)))
+    assert day.free_windows(480, 1320, 60) == [(510, 600), (660, 720), (780, 1290)]
+    assert day.free_windows(480, 1320, 61) == [(510, 600), (780, 1290)]
+    assert intervals().free_windows(480, 1320, 60) == [(480, 1320)]
+
+def test_free_slots_skips_lessons_that_end_after_the_selected_week(tmp_path):
+    store = SharedStore(json_storage(tmp_path))
+    store.commit(lesson("Salı", "10:00:00", "12:00:00", 1), store.version)
+    store.commit({"op": "delete_lesson", "day": "Salı", "start": "10:00:00", "until": shift_week(CURRENT_WEEK, 2)}, store.version)
+
+    tuesday = [(s, e) for day, s, e in free_slots(store.app, 60, week=CURRENT_WEEK) if day == "Salı"]
+    assert tuesday == [(time(8, 0), time(10, 0)), (time(12, 0), time(22, 0))]
+    assert [(s, e) for day, s, e in free_slots(store.app, 60, week=shift_week(CURRENT_WEEK, 2)) if day == "Salı"] == [(time(8, 0), time(22, 0))]
+    for start, _ in tuesday:  # Önerilen her başlangıç, aynı haftadan başlayan ders olarak kabul edilir
+        store.commit({**lesson("Salı", start.strftime('%H:%M:%S'), f"{start.hour + 1:02d}:00:00", 2), "since": CURRENT_WEEK}, store.version)
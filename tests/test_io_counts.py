@@ -0,0 +1,35 @@
+"""Yazma sayaçları: commit / save yalnızca kendi yazmalarını döndürür, profil de yalnızca kendi çalıştırmasınınkileri toplar."""
+import os
+
+import ritim_core
+from ritim_core import RerunProfile, SharedStore, SqliteStorage, add_io
+
+from helpers import json_storage, payment
+
+def test_json_commit_returns_its_own_journal_bytes(tmp_path):
+    store = SharedStore(json_storage(tmp_path))
+    journal = tmp_path / "ritim_data.journal"
+    before = os.path.getsize(journal) if journal.exists() else 0
+    _, written = store.commit(payment(1, "2024-05-01"), store.version)
+    assert written == {"commits": 1, "bytes_written": os.path.getsize(journal) - before}
+
+def test_compaction_is_counted_as_a_save(tmp_path, monkeypatch):
+    store = SharedStore(json_storage(tmp_path))
+    monkeypatch.setattr(ritim_core, "JOURNAL_MAX_BYTES", 1)
+    _, written = store.commit(payment(1, "2024-05-01"), store.version)
+    assert written["commits"] == written["saves"] == 1
+    assert os.path.getsize(tmp_path / "ritim_data.journal") == 0
+    assert written["bytes_written"] > os.path.getsize(tmp_path / "ritim_data.json")
+
+def test_sqlite_batch_counts_rows_once(tmp_path):
+    store = SharedStore(SqliteStorage(str(tmp_path / "ritim_data.db"), json_storage(tmp_path)))
+    _, written = store.commit_batch([payment(1, "2024-05-01"), payment(2, "2024-05-01")], store.version)
+    assert written["commits"] == 1 and written["rows_written"] >= 2
+    store.storage.conn.close()
+
+def test_profiles_only_sum_their_own_commits(tmp_path):
+    store = SharedStore(json_storage(tmp_path))
+    mine, other = RerunProfile("mine"), RerunProfile("other")
+    add_io(mine.io, store.commit(payment(1, "2024-05-01"), store.version)[1])
+    for day in ("2024-05-02", "2024-05-03"): add_io(other.io, store.commit(payment(2, day), store.version)[1])
+    assert mine.finish()["commits"] == 1 and other.finish()["commits"] == 2
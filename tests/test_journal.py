@@ -0,0 +1,36 @@
+"""Günlük (ritim_data.journal) tekrar oynatma ve sıkıştırma testleri (python -m pytest)."""
+import json
+
+import ritim_core
+from ritim_core import SharedStore, compute_week, payment_history
+
+from helpers import CURRENT_WEEK, json_storage, lesson, payment
+
+def test_journal_replay_truncates_torn_tail(tmp_path):
+    store = SharedStore(json_storage(tmp_path))
+    store.commit(payment(1, "2024-01-05"), store.version)
+    with open(tmp_path / "ritim_data.journal", "a", encoding="utf-8") as f:
+        f.write('{"seq": 99, "op": "add_pa')  # Yazım ortasında kesilmiş satır
+
+    store = SharedStore(json_storage(tmp_path))
+    store.commit(payment(1, "2024-02-05"), store.version)
+    store.commit(payment(1, "2024-03-05"), store.version)
+
+    app = json_storage(tmp_path).load()
+    assert [d.isoformat() for d in payment_history(app["students"][0])] == ["2024-03-05", "2024-02-05", "2024-01-05"]
+    with open(tmp_path / "ritim_data.journal", encoding="utf-8") as f:
+        assert [json.loads(line)["seq"] for line in f] == [1, 2, 3]
+
+def test_journal_compaction_keeps_state(tmp_path, monkeypatch):
+    monkeypatch.setattr(ritim_core, "JOURNAL_MAX_BYTES", 200)
+    store = SharedStore(json_storage(tmp_path))
+    store.commit(lesson("Salı", "10:00:00", "11:00:00", 1), store.version)
+    for month in range(1, 6):
+        store.commit(payment(2, f"2024-{month:02d}-10"), store.version)
+    store.commit({"op": "set_status", "week": CURRENT_WEEK, "day": "Salı", "start": "10:00:00", "status": "Yapıldı"}, store.version)
+
+    assert (tmp_path / "ritim_data.journal").stat().st_size < 200
+    app = json_storage(tmp_path).load()
+    assert len(payment_history(app["students"][1])) == 5
+    assert [ev["status"] for ev in compute_week(app, CURRENT_WEEK)["Salı"]] == ["Yapıldı"]
+    assert app["students"][0]["lesson_counts"]["Yapıldı"] == 1
@@ -0,0 +1,41 @@
+"""Öğrenci başına yapıldı / telafi sayaçlarının işlemlerle birlikte güncellenmesi."""
+from ritim_core import COUNTED_STATUSES, SharedStore, default_state, shift_week
+
+from helpers import CURRENT_WEEK, json_storage, lesson
+
+def counts(app, student_id: int) -> tuple:
+    return tuple(app["students"][student_id - 1]["lesson_counts"][status] for status in COUNTED_STATUSES)
+
+def status(store, week: str, value: str, **extra):
+    store.commit({"op": "set_status", "week": week, "day": "Salı", "start": "10:00:00", "status": value, **extra}, store.version)
+
+def test_status_changes_move_the_count_between_statuses(tmp_path):
+    store = SharedStore(json_storage(tmp_path))
+    last_week, two_weeks_ago = shift_week(CURRENT_WEEK, -1), shift_week(CURRENT_WEEK, -2)
+    store.commit(lesson("Salı", "10:00:00", "11:00:00", 1), store.version)
+    status(store, last_week, "Yapıldı")
+    assert counts(store.app, 1) == (1, 0, 0)
+    status(store, last_week, "Yapılmadı-Öğrenci")
+    status(store, two_weeks_ago, "Yapılmadı-Eğitmen")
+    assert counts(store.app, 1) == (0, 1, 1)
+    status(store, two_weeks_ago, "İptal")
+    assert counts(store.app, 1) == (0, 1, 0)
+    assert counts(json_storage(tmp_path).load(), 1) == (0, 1, 0)
+
+def test_deleting_a_lesson_keeps_past_counts_and_deleting_a_makeup_drops_its_count(tmp_path):
+    store = SharedStore(json_storage(tmp_path))
+    last_week = shift_week(CURRENT_WEEK, -1)
+    store.commit(lesson("Salı", "10:00:00", "11:00:00", 1), store.version)
+    status(store, last_week, "Yapılmadı-Öğrenci")
+    store.commit({"op": "delete_lesson", "day": "Salı", "start": "10:00:00", "until": CURRENT_WEEK}, store.version)
+    assert counts(store.app, 1) == (0, 1, 0)
+
+    store.commit({"op": "add_makeup", "week": CURRENT_WEEK, "day": "Salı", "start": "10:00:00", "end": "11:00:00", "student_id": 1}, store.version)
+    status(store, CURRENT_WEEK, "Yapıldı")
+    assert counts(store.app, 1) == (1, 1, 0)
+    store.commit({"op": "delete_makeup", "week": CURRENT_WEEK, "day": "Salı", "start": "10:00:00"}, store.version)
+    assert counts(store.app, 1) == (0, 1, 0)
+    assert counts(json_storage(tmp_path).load(), 1) == (0, 1, 0)
+
+def test_default_state_students_start_with_zero_counts():
+    assert all(student["lesson_counts"] == dict.fromkeys(COUNTED_STATUSES, 0) for student in default_state()["students"])
@@ -0,0 +1,30 @@
+"""Vade hesabı (next_due_date) ve ödeme yaşlandırma kovaları."""
+from datetime import date, timedelta
+
+import pytest
+
+from ritim_core import AGING_BUCKETS, aging_bucket, compute_payment_status, default_state, next_due_date
+
+@pytest.mark.parametrize("last_payment, payment_day, expected", [
+    (date(2024, 1, 31), 31, date(2024, 2, 29)),  # Artık yıl: şubatın son günü
+    (date(2023, 1, 31), 30, date(2023, 2, 28)),
+    (date(2024, 3, 15), 31, date(2024, 4, 30)),
+    (date(2024, 12, 5), 5, date(2025, 1, 5)),
+    (date(2024, 5, 20), 1, date(2024, 6, 1)),
+])
+def test_next_due_date_falls_back_to_the_last_day_of_short_months(last_payment, payment_day, expected):
+    assert next_due_date(last_payment, payment_day) == expected
+
+@pytest.mark.parametrize("overdue_days, expected", [(-5, "Güncel"), (0, "Güncel"), (1, "1–30 gün"), (30, "1–30 gün"),
+                                                    (31, "31–60 gün"), (60, "31–60 gün"), (61, "60+ gün")])
+def test_aging_bucket_edges(overdue_days, expected):
+    today = date(2024, 6, 15)
+    assert aging_bucket(today - timedelta(days=overdue_days), today) == expected
+
+def test_payment_status_uses_last_payment_and_payment_day():
+    app = default_state()
+    first, second = app["students"][:2]
+    first.update(last_payment_date=date(2024, 1, 31), payment_day=31)
+    status = compute_payment_status(app, date(2024, 3, 1))
+    assert status[first["id"]] == {"due": date(2024, 2, 29), "overdue_days": 1, "bucket": "1–30 gün"}
+    assert status[second["id"]]["bucket"] == "Plan yok" == AGING_BUCKETS[-1]
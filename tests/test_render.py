@@ -0,0 +1,26 @@
+"""Haftalık tablo önbelleği: bir düzenleme yalnızca o günün sütununu yeniler."""
+from ritim_core import DAYS, SharedStore, render_table_html
+
+from helpers import CURRENT_WEEK, json_storage, lesson
+
+def test_lesson_edit_rebuilds_only_that_days_column(tmp_path):
+    store = SharedStore(json_storage(tmp_path))
+    store.commit(lesson("Pazartesi", "10:00:00", "11:00:00", 1), store.version)
+    cache = {}
+    render_table_html(store.app, CURRENT_WEEK, cache=cache)
+    before = {day: cache["columns"][("genel", day)][1] for day in DAYS}
+
+    store.commit(lesson("Perşembe", "15:00:00", "16:00:00", 2), store.version)
+    html = render_table_html(store.app, CURRENT_WEEK, cache=cache)
+    rebuilt = [day for day in DAYS if cache["columns"][("genel", day)][1] is not before[day]]
+    assert rebuilt == ["Perşembe"]
+    assert html == render_table_html(store.app, CURRENT_WEEK) and "Öğrenci 2" in html
+
+def test_cached_table_is_reused_until_something_changes(tmp_path):
+    store = SharedStore(json_storage(tmp_path))
+    store.commit(lesson("Salı", "10:00:00", "11:00:00", 1), store.version)
+    cache = {}
+    first = render_table_html(store.app, CURRENT_WEEK, cache=cache)
+    assert render_table_html(store.app, CURRENT_WEEK, cache=cache) is first
+    store.commit({"op": "set_status", "week": CURRENT_WEEK, "day": "Salı", "start": "10:00:00", "status": "Yapıldı"}, store.version)
+    assert "cell-done" in render_table_html(store.app, CURRENT_WEEK, cache=cache)
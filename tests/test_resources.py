@@ -0,0 +1,41 @@
+"""Kaynaklar ve şubeler: kaynağa özel mesai saatleri, ders bağlantısındaki şube ve şube dosyaları."""
+from datetime import time
+
+import pytest
+
+from ritim_core import BRANCHES, SharedStore, SqliteStorage, branch_files, render_table_html, resource_hours
+
+from helpers import CURRENT_WEEK, json_storage, lesson
+
+STORAGES = {"json": json_storage, "sqlite": lambda path: SqliteStorage(str(path / "ritim_data.db"), json_storage(path))}
+
+def with_room(storage):
+    store = SharedStore(storage)
+    store.commit({"op": "add_resource", "id": "k2", "name": "Oda 2"}, store.version)
+    return store
+
+@pytest.mark.parametrize("backend", STORAGES)
+def test_resource_working_hours_stay_separate_from_branch_default(tmp_path, backend):
+    store = with_room(STORAGES[backend](tmp_path))
+    store.commit({"op": "set_working_hours", "resource": "k2", "start": "09:00:00", "end": "12:00:00"}, store.version)
+    store.commit({"op": "set_working_hours", "start": "10:00:00", "end": "20:00:00"}, store.version)
+    with pytest.raises(ValueError):
+        store.commit(lesson("Salı", "13:00:00", "14:00:00", 1, resource="k2"), store.version)
+    if backend == "sqlite": store.storage.conn.close()
+    for app in (store.app, STORAGES[backend](tmp_path).load()):
+        assert resource_hours(app, "k2") == (time(9, 0), time(12, 0))
+        assert resource_hours(app) == resource_hours(app, "yok") == (time(10, 0), time(20, 0))
+
+def test_lesson_link_carries_resource_and_branch(tmp_path):
+    store = with_room(json_storage(tmp_path))
+    store.commit(lesson("Salı", "10:00:00", "11:00:00", 1, resource="k2"), store.version)
+    store.commit(lesson("Salı", "10:00:00", "11:00:00", 2), store.version)
+    assert "&resource=k2&branch=Kad%C4%B1k%C3%B6y%20%C5%9Eube'" in render_table_html(store.app, CURRENT_WEEK, "k2", branch="Kadıköy Şube")
+    assert "start=10:00:00&branch=Kad%C4%B1k%C3%B6y%20%C5%9Eube'" in render_table_html(store.app, CURRENT_WEEK, branch="Kadıköy Şube")
+    assert "branch=" not in render_table_html(store.app, CURRENT_WEEK)
+
+def test_branches_get_separate_files():
+    assert branch_files(BRANCHES[0])["data_file"] == "ritim_data.json"
+    assert branch_files("Kadıköy Şube") == {"data_file": "ritim_data_kadikoy-sube.json", "journal_file": "ritim_data_kadikoy-sube.journal",
+                                           "weeks_dir": "ritim_weeks_kadikoy-sube", "snapshot_file": "ritim_data_kadikoy-sube.cache",
+                                           "db_file": "ritim_data_kadikoy-sube.db"}
@@ -0,0 +1,48 @@
+"""SharedStore: sürümlü, iyimser eşzamanlılıkla ortak durum ve işlem doğrulaması."""
+import threading
+
+import pytest
+
+from ritim_core import ConflictError, SharedStore, payment_history
+
+from helpers import CURRENT_WEEK, json_storage, lesson, payment
+
+def test_stale_status_after_template_replaced_is_rejected(tmp_path):
+    store = SharedStore(json_storage(tmp_path))
+    store.commit(lesson("Cuma", "12:00:00", "13:00:00", 1), store.version)
+    seen_version = store.version
+    store.commit({"op": "delete_lesson", "day": "Cuma", "start": "12:00:00", "until": CURRENT_WEEK}, store.version)
+    store.commit({**lesson("Cuma", "12:00:00", "13:00:00", 2), "since": CURRENT_WEEK}, store.version)
+
+    with pytest.raises(ConflictError):
+        store.commit({"op": "set_status", "week": CURRENT_WEEK, "day": "Cuma", "start": "12:00:00", "status": "Yapılmadı-Öğrenci"}, seen_version)
+    assert store.app["students"][1]["lesson_counts"]["Yapılmadı-Öğrenci"] == 0
+
+def test_concurrent_commits_get_distinct_versions(tmp_path):
+    store = SharedStore(json_storage(tmp_path))
+    errors = []
+
+    def pay(student_id):
+        try:
+            for month in range(1, 13):
+                store.commit(payment(student_id, f"2023-{month:02d}-15"), store.version)
+        except Exception as e:  # pragma: no cover - yalnızca başarısızlıkta
+            errors.append(e)
+
+    threads = [threading.Thread(target=pay, args=(student_id,)) for student_id in range(1, 9)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+
+    assert errors == []
+    assert store.version == 8 * 12
+    app = json_storage(tmp_path).load()
+    assert all(len(payment_history(app["students"][i])) == 12 for i in range(8))
+
+@pytest.mark.parametrize("op", [lesson("Cuma", "21:00:00", "00:00:00", 1), lesson("Cuma", "12:00:00", "12:00:00", 1),
+                                {"op": "add_makeup", "week": CURRENT_WEEK, "day": "Cuma", "start": "14:00:00", "end": "13:30:00", "student_id": 1},
+                                lesson("Pazar", "10:00:00", "11:00:00", 1)])
+def test_lesson_with_bad_day_or_times_is_rejected(tmp_path, op):
+    store = SharedStore(json_storage(tmp_path))
+    with pytest.raises(ValueError):
+        store.commit(op, store.version)
+    assert store.version == 0 and not (tmp_path / "ritim_data.journal").exists()
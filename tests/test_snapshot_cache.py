@@ -0,0 +1,31 @@
+"""Çözülmüş durum önbelleği (ritim_data.cache): JSON'un mtime ya da boyutu değişince kullanılmaz."""
+import os
+
+import pytest
+
+from ritim_core import SharedStore
+
+from helpers import json_storage
+
+def saved_store(tmp_path):
+    store = SharedStore(json_storage(tmp_path))
+    store.save()
+    return tmp_path / "ritim_data.json"
+
+def test_snapshot_is_used_while_json_is_unchanged(tmp_path):
+    saved_store(tmp_path)
+    storage = json_storage(tmp_path)
+    assert storage._read_snapshot() is not None
+    assert storage.load()["students"][0]["name"] == "Öğrenci 1"
+
+# Aynı boyutta yeni zaman damgası / eski zaman damgasıyla farklı boyut
+@pytest.mark.parametrize("new, mtime_shift", [("Öğrenci 9", 1_000_000_000), ("Öğrenci 10", 0)], ids=["mtime", "size"])
+def test_snapshot_is_rejected_when_json_changes(tmp_path, new, mtime_shift):
+    data_file = saved_store(tmp_path)
+    stat = os.stat(data_file)
+    data_file.write_text(data_file.read_text(encoding="utf-8").replace("Öğrenci 1", new, 1), encoding="utf-8")
+    os.utime(data_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + mtime_shift))
+    storage = json_storage(tmp_path)
+    assert storage._read_snapshot() is None
+    assert storage.load()["students"][0]["name"] == new
+    assert storage._read_snapshot()["students"][0]["name"] == new  # Yeniden çözülen durum önbelleğe yazıldı
@@ -0,0 +1,40 @@
+"""SQLite arka ucu: JSON'dan aktarma ve işlemlerin yeniden açılışta korunması."""
+from ritim_core import SharedStore, SqliteStorage, compute_week, payment_history, shift_week
+
+from helpers import CURRENT_WEEK, json_storage, lesson, payment
+
+def test_json_to_sqlite_migration_round_trip(tmp_path):
+    source = json_storage(tmp_path)
+    store = SharedStore(source)
+    past = shift_week(CURRENT_WEEK, -2)
+    store.commit({"op": "add_resource", "id": "k2", "name": "Oda 2"}, store.version)
+    store.commit(lesson("Salı", "10:00:00", "11:00:00", 1), store.version)
+    store.commit(lesson("Salı", "10:00:00", "11:00:00", 2, resource="k2"), store.version)
+    store.commit({"op": "set_status", "week": past, "day": "Salı", "start": "10:00:00", "status": "Yapılmadı-Öğrenci", "resource": "k2"}, store.version)
+    store.commit({"op": "delete_lesson", "day": "Salı", "start": "10:00:00", "until": CURRENT_WEEK}, store.version)
+    store.commit(payment(3, "2024-05-01"), store.version)
+    store.save()
+
+    sqlite_storage = SqliteStorage(str(tmp_path / "ritim_data.db"), source)
+    migrated = sqlite_storage.load()
+    for week in (past, CURRENT_WEEK):
+        assert compute_week(migrated, week) == compute_week(store.app, week)
+    assert [r["id"] for r in migrated["resources"]] == ["genel", "k2"]
+    assert payment_history(migrated["students"][2]) == payment_history(store.app["students"][2])
+    assert migrated["students"][1]["lesson_counts"]["Yapılmadı-Öğrenci"] == 1
+
+    reopened = SqliteStorage(str(tmp_path / "ritim_data.db")).load()
+    assert compute_week(reopened, past) == compute_week(store.app, past)
+
+def test_sqlite_commits_survive_reopen(tmp_path):
+    store = SharedStore(SqliteStorage(str(tmp_path / "ritim_data.db"), json_storage(tmp_path)))
+    store.commit(lesson("Çarşamba", "14:00:00", "15:00:00", 4), store.version)
+    store.commit({"op": "set_status", "week": CURRENT_WEEK, "day": "Çarşamba", "start": "14:00:00", "status": "Yapıldı"}, store.version)
+    store.commit(payment(4, "2024-06-03"), store.version)
+    store.commit({"op": "update_student", "id": 4, "name": "Yeni Ad", "parent_name": "Veli", "parent_phone": "555", "dob": None}, store.version)
+
+    reopened = SqliteStorage(str(tmp_path / "ritim_data.db")).load()
+    assert compute_week(reopened, CURRENT_WEEK) == compute_week(store.app, CURRENT_WEEK)
+    student = reopened["students"][3]
+    assert (student["name"], student["lesson_counts"]["Yapıldı"]) == ("Yeni Ad", 1)
+    assert [d.isoformat() for d in payment_history(student)] == ["2024-06-03"]
@@ -0,0 +1,45 @@
+"""Haftalık kayıtlar: şablon sona erdirme, bellekten çıkarılan haftaların yeniden okunması ve hafta başına LRU."""
+from ritim_core import WEEK_CACHE_SIZE, SharedStore, compute_week, materialized_week, shift_week
+
+from helpers import CURRENT_WEEK, json_storage, lesson
+
+def starts(app, week, day="Pazartesi"):
+    return [(ev["start"].strftime('%H:%M'), ev["status"]) for ev in compute_week(app, week)[day]]
+
+def test_delete_lesson_keeps_past_weeks_and_ends_future_ones(tmp_path):
+    store = SharedStore(json_storage(tmp_path))
+    store.commit(lesson("Pazartesi", "10:00:00", "11:00:00", 1), store.version)
+    past = shift_week(CURRENT_WEEK, -1)
+    store.commit({"op": "set_status", "week": past, "day": "Pazartesi", "start": "10:00:00", "status": "Yapıldı"}, store.version)
+    store.commit({"op": "delete_lesson", "day": "Pazartesi", "start": "10:00:00", "until": CURRENT_WEEK}, store.version)
+    for app in (store.app, json_storage(tmp_path).load()):
+        assert starts(app, shift_week(CURRENT_WEEK, -2)) == [("10:00", "Planlandı")]
+        assert starts(app, past) == [("10:00", "Yapıldı")]
+        assert starts(app, CURRENT_WEEK) == starts(app, shift_week(CURRENT_WEEK, 3)) == []
+
+def test_evicted_weeks_reload_from_storage(tmp_path):
+    store = SharedStore(json_storage(tmp_path))
+    weeks = [shift_week(CURRENT_WEEK, -offset) for offset in range(1, WEEK_CACHE_SIZE + 4)]
+    store.commit(lesson("Pazartesi", "10:00:00", "11:00:00", 1, since=weeks[-1]), store.version)
+    for week in weeks:
+        store.commit({"op": "set_status", "week": week, "day": "Pazartesi", "start": "10:00:00", "status": "Yapıldı"}, store.version)
+    store.save()  # Haftalar kaydedilince temiz sayılır ve bellekten çıkarılabilir
+    for week in weeks: materialized_week(store.app, week)
+    assert len(store.app["weeks"]) <= WEEK_CACHE_SIZE
+    assert weeks[0] not in store.app["weeks"]
+    assert starts(store.app, weeks[0]) == [("10:00", "Yapıldı")]
+
+def test_many_resources_share_one_lru_entry_per_week(tmp_path):
+    store = SharedStore(json_storage(tmp_path))
+    resources = [f"k{i}" for i in range(WEEK_CACHE_SIZE + 2)]
+    for resource in resources:
+        store.commit({"op": "add_resource", "id": resource, "name": resource}, store.version)
+    store.commit(lesson("Salı", "10:00:00", "11:00:00", 1, resource="k0"), store.version)
+    weeks = [shift_week(CURRENT_WEEK, -offset) for offset in range(2)]
+    for week in weeks:
+        for resource in resources: materialized_week(store.app, week, resource)
+    lru = store.app["_week_lru"]
+    assert list(lru) == weeks
+    assert all(set(lru[week]) == set(resources) for week in weeks)
+    assert materialized_week(store.app, weeks[0], "k0") is lru[weeks[0]]["k0"][1]
+    assert [ev["resource"] for ev in lru[weeks[0]]["k0"][1]["Salı"]] == ["k0"]